@@ -23,10 +23,12 @@ setuptools.setup(
     install_requires=[
         'clize>=4.0.0',
         'PingdomLib>=2.0.0',
+        'requests>=2.0.0',
         'enum-compat>=0.0.2',
         'arrow>=0.10.0',
         'configobj>=5.0.6',
         'lazy-object-proxy>=1.3.1',
+        'futures>=3.0.0; python_version < "3"',
     ],
 
     classifiers=[
@@ -47,7 +49,13 @@ setuptools.setup(
     extras_require={
         'gsheet': [
             'pygsheets',
-        ]
+        ],
+        'async': [
+            'aiohttp',
+        ],
+        'numpy': [
+            'numpy',
+        ],
     },
     keywords="pingdom uptime sla api"
 )
@@ -1,17 +1,44 @@
 # -*- coding: utf-8 -*-
-from collections import OrderedDict, defaultdict
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+import attr
 from sigtools.modifiers import autokwoargs
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 @autokwoargs
-def offset_iter(method, limit=1000, offset=0, *args, **kwargs):
+def offset_iter(method, limit=1000, offset=0, prefetch=0, *args, **kwargs):
     """Call a method with limit/offset arguments until exhausted.
 
     Given a callable that accepts limit/offset keyword arguments
     and returns an iterable, call the method repeatedly until
     less than limit items are returned, yielding each item.
+
+    When ``prefetch`` is more than zero, up to that many of the following
+    pages are fetched in background threads while the current page is
+    consumed, see :func:`prefetch_pages`.
     """
+    if prefetch > 0:
+        pages = prefetch_pages(
+            method, limit, offset, prefetch, *args, **kwargs)
+        for page in pages:
+            for result in page:
+                yield result
+        return
     previous = -limit
     o = offset
     while previous < o and not (o - previous) % limit:
@@ -21,6 +48,68 @@ def offset_iter(method, limit=1000, offset=0, *args, **kwargs):
             yield result
 
 
+def prefetch_pages(method, limit, offset, prefetch, *args, **kwargs):
+    """Yield pages of a limit/offset method, fetching ahead in threads.
+
+    The first page is fetched on its own, so a method with a single short
+    page is called exactly once. Once a full page is returned, up to
+    ``prefetch`` following pages are kept in flight while the current one
+    is consumed. Pages are yielded in order as lists, up to and including
+    the first page with less than ``limit`` items; pages fetched past it
+    are discarded. An exception raised while fetching a page is re-raised
+    when that page is reached.
+    """
+    def fetch(o):
+        return list(method(limit=limit, offset=o, *args, **kwargs))
+
+    page = fetch(offset)
+    yield page
+    if len(page) < limit:
+        return
+    offset += limit
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    pending.append(executor.submit(fetch, offset))
+                    offset += limit
+                page = pending.popleft().result()
+                yield page
+                if len(page) < limit:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def split_range(start, finish, size):
+    """Split a time range into consecutive windows, newest first.
+
+    Each window is a ``(start, finish)`` tuple at most ``size`` seconds
+    long, where the finish of a window is the start of the next newer one.
+
+    Example:
+
+        >>> split_range(0, 25, 10)
+        [(15, 25), (5, 15), (0, 5)]
+
+    Args:
+        start (int): the start timestamp of the range.
+        finish (int): the finish timestamp of the range.
+        size (int): the maximum length of a window in seconds.
+
+    Returns:
+        list: a list of ``(start, finish)`` tuples.
+    """
+    windows = []
+    while finish - start > size:
+        windows.append((finish - size, finish))
+        finish -= size
+    windows.append((start, finish))
+    return windows
+
+
 def group_by_range(it, pred, keyfunc=None):
     """Return contiguous ranges of items satisfying a predicate."""
     ranges = OrderedDict()
@@ -46,3 +135,266 @@ def group_by_range(it, pred, keyfunc=None):
             list(r),
             None
         )
+
+
+def concurrent_iter(method, items, concurrency=1):
+    """Call a method for each item using a bounded pool of worker threads.
+
+    Yields ``(item, results)`` tuples in the same order as ``items``. The
+    method must return an iterable which, when ``concurrency`` is more than
+    one, is fully consumed inside the worker thread. At most ``concurrency``
+    items are in flight or buffered at any time.
+
+    With a ``concurrency`` of one or less no threads are used and the
+    iterables are yielded lazily, as returned by the method.
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield item, method(item)
+        return
+
+    def consume(item):
+        return list(method(item))
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            for item in items:
+                pending.append((item, executor.submit(consume, item)))
+                if len(pending) >= concurrency:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_async(aiterable):
+    """Iterate over an asynchronous iterable from synchronous code.
+
+    A new event loop is used to fetch each item in turn, so this must not be
+    called from within a running event loop.
+    """
+    loop = asyncio.new_event_loop()
+    it = aiterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(it.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        aclose = getattr(it, 'aclose', None)
+        if aclose is not None:
+            loop.run_until_complete(aclose())
+        loop.close()
+
+
+@attr.s
+class TokenBucket(object):
+    """A token bucket shared between threads and asynchronous tasks.
+
+    Tokens are added at ``rate`` tokens per second up to ``capacity``. A
+    bucket without a rate never limits. Callers reserve tokens with
+    :meth:`reserve`, which returns how many seconds to wait before using
+    them, or use :meth:`acquire` to wait in the current thread.
+
+    Example:
+
+        >>> bucket = TokenBucket(rate=2, capacity=1)
+        >>> bucket.reserve()
+        0.0
+        >>> 0 < bucket.reserve() <= 0.5
+        True
+    """
+
+    rate = attr.ib(default=None)
+    capacity = attr.ib(default=1)
+    tokens = attr.ib(default=None)
+    updated = attr.ib(default=attr.Factory(time.time))
+    _lock = attr.ib(init=False, repr=False,
+                    default=attr.Factory(threading.Lock))
+
+    def __attrs_post_init__(self):
+        if self.tokens is None:
+            self.tokens = self.capacity
+
+    def _refill(self):
+        now = time.time()
+        if self.rate:
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @contextmanager
+    def _state(self):
+        """Hold the lock on the bucket state while refilling it."""
+        with self._lock:
+            self._refill()
+            yield
+
+    def reserve(self, tokens=1):
+        with self._state():
+            if not self.rate:
+                return 0.0
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def update(self, rate):
+        with self._state():
+            self.rate = rate
+
+
+@contextmanager
+def shared_state(bucket, fields):
+    """Load and save the ``fields`` of a bucket from its lock file.
+
+    The file at ``bucket.path`` is locked while the state is in use. Lock
+    files are not supported on all platforms, in which case the state is
+    only shared within the process.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(bucket.path, 'a+') as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            fp.seek(0)
+            try:
+                state = json.loads(fp.read())
+            except ValueError:
+                state = {}
+            for field in fields:
+                if field in state:
+                    setattr(bucket, field, state[field])
+            yield
+            fp.seek(0)
+            fp.truncate()
+            json.dump({f: getattr(bucket, f) for f in fields}, fp)
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+@attr.s
+class SharedTokenBucket(TokenBucket):
+    """A token bucket also shared between processes through a lock file.
+
+    The bucket state is kept in the file at ``path``, which is locked while
+    the state is updated, see :func:`shared_state`.
+    """
+
+    path = attr.ib(default=None)
+
+    @contextmanager
+    def _state(self):
+        with self._lock, shared_state(self, ('rate', 'tokens', 'updated')):
+            self._refill()
+            yield
+
+
+@attr.s
+class QuotaBucket(object):
+    """A request quota that resets periodically, shared between threads.
+
+    The bucket holds the requests ``remaining`` until the quota resets at
+    the ``reset`` timestamp, when it is refilled to ``limit``. Requests
+    within the quota are never delayed; once it is used up, requests wait
+    for the reset. The quota is learned from the API with :meth:`update`,
+    and a bucket that was never updated never limits.
+
+    Example:
+
+        >>> bucket = QuotaBucket()
+        >>> bucket.update(remaining=2, reset=60)
+        >>> [bucket.reserve() for _ in range(2)]
+        [0.0, 0.0]
+        >>> 59 < bucket.reserve() <= 60
+        True
+    """
+
+    remaining = attr.ib(default=None)
+    limit = attr.ib(default=0)
+    reset = attr.ib(default=None)
+    period = attr.ib(default=0)
+    _lock = attr.ib(init=False, repr=False,
+                    default=attr.Factory(threading.Lock))
+
+    def _refill(self, now):
+        while self.reset is not None and now >= self.reset:
+            # requests waiting for the reset are taken from the new quota
+            self.remaining = min(self.remaining, 0) + self.limit
+            self.reset = self.reset + self.period if self.period else None
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            yield
+
+    def reserve(self, tokens=1):
+        """Reserve requests, return how many seconds to wait before them."""
+        with self._state():
+            now = time.time()
+            self._refill(now)
+            if self.remaining is None:
+                return 0.0
+            self.remaining -= tokens
+            if self.remaining >= 0:
+                return 0.0
+            if self.reset is None:
+                return float(self.period)
+            periods = (-self.remaining - 1) // max(self.limit, 1)
+            return max(0.0, self.reset - now) + periods * self.period
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def update(self, remaining, reset):
+        """Update the quota from the API.
+
+        Args:
+            remaining (int): how many requests the API still allows.
+            reset (int): how many seconds until the quota is reset.
+        """
+        with self._state():
+            now = time.time()
+            self._refill(now)
+            reset_at = now + reset
+            if self.remaining is None or self.reset is None or (
+                    reset_at > self.reset + 1):
+                # a new period: the API count is authoritative
+                self.remaining = remaining
+            else:
+                # keep requests reserved since the API counted them
+                self.remaining = min(self.remaining, remaining)
+            self.reset = reset_at
+            self.limit = max(self.limit, remaining)
+            self.period = max(self.period, reset)
+
+
+@attr.s
+class SharedQuotaBucket(QuotaBucket):
+    """A quota bucket also shared between processes through a lock file.
+
+    See :func:`shared_state`.
+    """
+
+    path = attr.ib(default=None)
+
+    @contextmanager
+    def _state(self):
+        with self._lock, shared_state(
+                self, ('remaining', 'limit', 'reset', 'period')):
+            yield
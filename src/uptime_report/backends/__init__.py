@@ -4,12 +4,14 @@ This package contains generic backend code as well as implementations of
 backends.
 """
 from __future__ import print_function
+import logging
 import os
 import pkgutil
 
-from functools import partial
 from lazy_object_proxy import Proxy
 
+log = logging.getLogger(__name__)
+
 
 def _find_backends():
     mods = pkgutil.iter_modules(path=[os.path.dirname(__file__)])
@@ -19,10 +21,18 @@ def _find_backends():
 
 
 def _load_backends():
-    return {
-        name: Proxy(partial(loader.load_module, name))
-        for name, loader in _find_backends()
-    }
+    """Load the backends that can be imported on this interpreter.
+
+    Backends with dependencies that are missing, or which need a newer
+    Python, are skipped.
+    """
+    backends = {}
+    for name, loader in _find_backends():
+        try:
+            backends[name] = loader.load_module(name)
+        except (ImportError, SyntaxError):
+            log.debug("skipping backend %s", name, exc_info=True)
+    return backends
 
 
 _BACKENDS = Proxy(_load_backends)
@@ -1,20 +1,65 @@
 # -*- coding: utf-8 -*-
 """Pingdom backend for uptime data."""
 import enum
+import json
 import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter, deque
+from fnmatch import fnmatch
 from functools import partial
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from os.path import expanduser
+from timeit import default_timer
 
 import arrow
 import attr
+import requests
 from attr.validators import in_
 from pingdomlib import Pingdom
-from sigtools import wrappers
+from pingdomlib.check import PingdomCheck
+from requests.adapters import HTTPAdapter
+from six import integer_types, iteritems, string_types
 from six.moves import map
-from uptime_report.backend_utils import group_by_range, offset_iter
-from uptime_report.outage import Outage
+from uptime_report.backend_utils import (QuotaBucket, SharedQuotaBucket,
+                                         concurrent_iter, group_by_range,
+                                         offset_iter, split_range)
+from uptime_report.cache import MISSING, PageCache
+from uptime_report.outage import (Outage, OutageStreams, epoch,
+                                  start_timestamp)
+from uptime_report.store import DEFAULT_STORE, open_store
+from uptime_report.store.archive import STATUSES
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 log = logging.getLogger(__name__)
 
+MAX_OFFSET = 43200
+"""int: the maximum offset accepted by the Pingdom results API."""
+
+LIMIT_HEADERS = ('Req-Limit-Short', 'Req-Limit-Long')
+"""tuple: the headers Pingdom uses to report API rate limits."""
+
+MAX_RETRIES = 3
+"""int: how many times to retry a request rejected by the rate limit."""
+
+SETTLE_TIME = 600
+"""int: seconds after which results are assumed final and stored."""
+
+try:
+    array('q')
+    TIME_TYPECODE = 'q'
+except ValueError:  # Python 2 has no 64-bit array type code
+    TIME_TYPECODE = 'l'
+"""str: the :mod:`array` type code of timestamp arrays."""
+
 
 class ResultType(enum.Enum):
     UP = "up"
@@ -23,14 +68,82 @@ class ResultType(enum.Enum):
     UNKNOWN = "unknown"
 
 
-@attr.s
+RESULT_TYPES = tuple(ResultType(status) for status in STATUSES)
+"""tuple: the result types, indexed by their status code."""
+
+RESULT_CODES = {t: code for code, t in enumerate(RESULT_TYPES)}
+"""dict: the status code of each result type."""
+
+DOWN_CODE = RESULT_CODES[ResultType.DOWN]
+UP_CODE = RESULT_CODES[ResultType.UP]
+UNCONFIRMED_CODE = RESULT_CODES[ResultType.UNCONFIRMED]
+
+_descriptions = {}
+
+
+def intern_desc(desc):
+    """Return a shared copy of a result description."""
+    return _descriptions.setdefault(desc, desc)
+
+
+@attr.s(slots=True, init=False)
 class Result(object):
-    """Base result class."""
+    """A check result.
+
+    Results are kept compactly, as an integer timestamp, a status code
+    indexing :data:`RESULT_TYPES`, a probe ID and a shared description.
+    The ``time``, ``type`` and ``meta`` attributes are created on access.
 
-    time = attr.ib(convert=arrow.get)
+    Attributes:
+        timestamp (int): the time of the result.
+        check: the check of the result.
+        code (int): the status code of the result.
+        probeid (int): the ID of the probe that ran the check, or None.
+        desc (str): the status description, or None.
+    """
+
+    timestamp = attr.ib()
     check = attr.ib()
-    type = attr.ib(validator=in_(ResultType))
-    meta = attr.ib(default=attr.Factory(dict))
+    code = attr.ib()
+    probeid = attr.ib()
+    desc = attr.ib()
+
+    def __init__(self, time, check, type, meta=None):
+        self.timestamp = epoch(time)
+        self.check = check
+        try:
+            self.code = RESULT_CODES[type]
+        except KeyError:
+            raise ValueError("Invalid result type: {!r}".format(type))
+        meta = meta or {}
+        self.probeid = meta.get('probeid')
+        self.desc = intern_desc(meta.get('desc'))
+
+    @classmethod
+    def decoded(cls, timestamp, check, code, probeid, desc):
+        """Return a result from already decoded fields, unchecked."""
+        result = cls.__new__(cls)
+        result.timestamp = timestamp
+        result.check = check
+        result.code = code
+        result.probeid = probeid
+        result.desc = desc
+        return result
+
+    @property
+    def time(self):
+        """:class:`~arrow.arrow.Arrow`: the time of the result."""
+        return arrow.get(self.timestamp)
+
+    @property
+    def type(self):
+        """ResultType: the type of the result."""
+        return RESULT_TYPES[self.code]
+
+    @property
+    def meta(self):
+        """dict: the probe ID and description of the result, a copy."""
+        return {'probeid': self.probeid, 'desc': self.desc}
 
 
 class PingdomStatus(enum.Enum):
@@ -57,42 +170,321 @@ def make_result(check, item):
     )
 
 
+PINGDOM_CODES = {status.value: RESULT_CODES[status.to_result()]
+                 for status in PingdomStatus}
+"""dict: the status code of each Pingdom result status."""
+
+
+def make_results(check, items):
+    """Return the results of a page of API items.
+
+    When every item of the page has an integer time and a known status,
+    the items are decoded through :data:`PINGDOM_CODES` without checking
+    each one. Other pages are decoded item by item with
+    :func:`make_result`.
+    """
+    if not items:
+        return []
+    times = [item['time'] if 'time' in item else None for item in items]
+    statuses = {item.get('status') for item in items}
+    if (not statuses.issubset(PINGDOM_CODES) or
+            not all(type(t) in integer_types for t in times)):
+        return [make_result(check, item) for item in items]
+    decoded = Result.decoded
+    codes = PINGDOM_CODES
+    return [decoded(t, check, codes[item['status']], item.get('probeid'),
+                    intern_desc(item.get('statusdesc')))
+            for t, item in zip(times, items)]
+
+
+def result_row(result):
+    """Return a result as a row of a :mod:`~uptime_report.store`."""
+    return (result.timestamp, STATUSES[result.code], result.probeid,
+            result.desc)
+
+
+def row_result(check, row):
+    """Return a row of a :mod:`~uptime_report.store` as a result."""
+    time, status, probeid, desc = row
+    return Result(time=time, check=check, type=ResultType(status),
+                  meta={'probeid': probeid, 'desc': desc})
+
+
+@attr.s(frozen=True)
+class ResultBatch(object):
+    """Results of a check kept as parallel arrays, newest first.
+
+    Batches are built from whole API pages or store rows without creating
+    a :class:`Result` for each one.
+
+    Attributes:
+        check: the check of the results.
+        time (array): timestamps, see :data:`TIME_TYPECODE`.
+        status (array): uint8 status codes, see :data:`RESULT_TYPES`.
+        probe (array): uint32 probe IDs, 0 if unknown.
+        response (array): uint32 response times in milliseconds, 0 if
+            unknown.
+    """
+
+    check = attr.ib()
+    time = attr.ib()
+    status = attr.ib()
+    probe = attr.ib()
+    response = attr.ib()
+
+    @classmethod
+    def from_items(cls, check, items):
+        """Return a batch of results as returned by the API.
+
+        Raises:
+            ValueError: if a result has an unknown status, like
+                :func:`make_result`.
+        """
+        get = dict.get
+        try:
+            status = array('B', map(PINGDOM_CODES.__getitem__,
+                                    map(itemgetter('status'), items)))
+        except KeyError as e:
+            raise ValueError("Invalid result status: {!r}".format(e.args[0]))
+        return cls(
+            check,
+            array(TIME_TYPECODE, map(itemgetter('time'), items)),
+            status,
+            array('I', (get(i, 'probeid') or 0 for i in items)),
+            array('I', (get(i, 'responsetime') or 0 for i in items)))
+
+    @classmethod
+    def from_rows(cls, check, rows):
+        """Return a batch of rows of a :mod:`~uptime_report.store`."""
+        codes = {status: code for code, status in enumerate(STATUSES)}
+        return cls(
+            check,
+            array(TIME_TYPECODE, (row[0] for row in rows)),
+            array('B', (codes[row[1]] for row in rows)),
+            array('I', (row[2] or 0 for row in rows)),
+            array('I', [0]) * len(rows))
+
+    def __len__(self):
+        return len(self.time)
+
+    def results(self):
+        """Iterate over the results of the batch as :class:`Result`."""
+        for t, code, probe in zip(self.time, self.status, self.probe):
+            yield Result(time=t, check=self.check, type=RESULT_TYPES[code],
+                         meta={'probeid': probe or None})
+
+    def outages(self):
+        """Return the outages in the batch, newest first.
+
+        See :func:`outages_from_columns`.
+        """
+        return outages_from_columns(self.time[::-1], self.status[::-1])
+
+    def counts(self):
+        """Return how many results of each :class:`ResultType` there are."""
+        counts = Counter(self.status)
+        return {RESULT_TYPES[code]: n for code, n in counts.items()}
+
+
 @attr.s
 class MaxOffsetReached(Exception):
     offset = attr.ib()
 
 
-@wrappers.decorator
-def continue_offset(wrapped, *args, **kwargs):
-    result = None
-    retries = 0
-    while True:
-        try:
-            for result in wrapped(*args, **kwargs):
-                yield result
-            break
-        except MaxOffsetReached:
-            if retries == 3 or not result:
-                raise Exception("Too much data!")
-            retries += 1
-            kwargs['start'] = result.time.shift(seconds=1)
+def check_results(check, start=None, finish=None, *args, **kwargs):
+    """Return a page of the results of a check, see :func:`check_items`."""
+    return make_results(check, check_items(check, start, finish,
+                                           *args, **kwargs))
 
 
-def check_results(check, start=None, finish=None, *args, **kwargs):
-    if 'offset' in kwargs and kwargs['offset'] > 43200:
+def check_items(check, start=None, finish=None, *args, **kwargs):
+    """Return a page of the results of a check, as returned by the API.
+
+    When a :class:`~uptime_report.cache.PageCache` is passed as ``cache``,
+    pages are keyed on the check, the window and the other arguments, such
+    as the status filter and the page limit and offset. Pages of windows
+    that had finished :data:`SETTLE_TIME` before they were fetched never
+    expire, others expire after the cache ``ttl``.
+    """
+    cache = kwargs.pop('cache', None)
+    if 'offset' in kwargs and kwargs['offset'] > MAX_OFFSET:
         raise MaxOffsetReached(kwargs['offset'])
-    data = check.results(
-        time_from=start, time_to=finish, *args, **kwargs)
-    return map(partial(make_result, check), data['results'])
+    if cache is None:
+        return check.results(
+            time_from=start, time_to=finish, *args, **kwargs)['results']
+    key = ('results', check.id, start, finish, sorted(kwargs.items()))
+    items = cache.get(key)
+    if items is MISSING:
+        items = check.results(
+            time_from=start, time_to=finish, *args, **kwargs)['results']
+        cache.set(key, items, final=finish is not None and
+                  finish < time.time() - SETTLE_TIME)
+    return items
+
+
+def check_resolution(check):
+    """Return how often a check runs, in seconds.
+
+    Checks with an unknown resolution are assumed to run every minute.
+    """
+    try:
+        resolution = int(check.resolution)
+    except (AttributeError, TypeError, ValueError):
+        resolution = 1
+    return max(resolution, 1) * 60
+
+
+def window_size(check):
+    """Return the length of a window that fits under the offset cap.
+
+    Pingdom runs a check once every ``resolution`` minutes so a window of
+    this many seconds is expected to contain at most :data:`MAX_OFFSET`
+    results.
+    """
+    return check_resolution(check) * MAX_OFFSET
+
+
+def check_window(check, start, finish, closed=True, *args, **kwargs):
+    """Return the results of a check in a window, newest first.
+
+    See :func:`window_items`.
+    """
+    return make_results(check, window_items(check, start, finish, closed,
+                                            *args, **kwargs))
+
+
+def check_batch(check, start, finish, closed=True, *args, **kwargs):
+    """Return the results of a check in a window as a :class:`ResultBatch`.
+
+    See :func:`window_items`.
+    """
+    return ResultBatch.from_items(
+        check, window_items(check, start, finish, closed, *args, **kwargs))
+
+
+def window_items(check, start, finish, closed=True, *args, **kwargs):
+    """Return the API results of a check in a window, newest first.
+
+    The window includes ``start`` and excludes ``finish`` unless ``closed``
+    is true. Windows that exceed the offset cap are split in half until
+    each part can be fetched.
+    """
+    getter = partial(check_items, check, start=start, finish=finish)
+    try:
+        items = list(offset_iter(getter, *args, **kwargs))
+    except MaxOffsetReached:
+        if finish - start < 2:
+            raise
+        middle = (start + finish) // 2
+        log.debug("splitting window %s-%s of check %s at %s",
+                  start, finish, check, middle)
+        return (
+            window_items(check, middle, finish, closed, *args, **kwargs) +
+            window_items(check, start, middle, False, *args, **kwargs))
+    if closed:
+        return items
+    return [item for item in items if item['time'] < finish]
+
+
+def newest_result(check, start, finish, **kwargs):
+    """Return the newest result of a check in a window, or None."""
+    return next(iter(check_results(
+        check, start=start, finish=finish, limit=1, **kwargs)), None)
+
+
+def oldest_result(check, start, finish, **kwargs):
+    """Return the oldest result of a check in a window, or None.
+
+    Results are returned newest first, so windows starting at ``start``
+    are fetched, doubling in length until a result is found.
+    """
+    size = 2 * check_resolution(check)
+    while True:
+        end = min(finish, start + size)
+        getter = partial(check_results, check, start=start, finish=end)
+        results = list(offset_iter(getter, **kwargs))
+        if results:
+            return results[-1]
+        if end >= finish:
+            return None
+        size *= 2
+
+
+def with_boundaries(check, results, start, finish, **kwargs):
+    """Add the neighbouring non-down results to a list of down results.
+
+    Given the DOWN and UNCONFIRMED results of a check in a timeframe,
+    newest first, yields them along with the results that bound each
+    contiguous run, so the stream is equivalent to the unfiltered one for
+    :func:`outages_from_results`. Results closer to each other than the
+    check resolution are assumed to be contiguous. Other keyword arguments
+    are passed to :func:`check_results`.
+    """
+    status = ",".join([ResultType.UP.value, ResultType.UNKNOWN.value])
+    resolution = check_resolution(check)
+    if not results:
+        return
+    newest = results[0].timestamp
+    if newest < finish:
+        after = oldest_result(check, newest + 1, finish, status=status,
+                              **kwargs)
+        if after:
+            yield after
+    for newer, older in zip(results, results[1:]):
+        yield newer
+        a, b = older.timestamp, newer.timestamp
+        if b - a <= resolution:
+            continue
+        before = newest_result(check, a + 1, b - 1, status=status,
+                               **kwargs)
+        if before is None:
+            continue
+        yield before
+        after = oldest_result(
+            check, a + 1, before.timestamp, status=status, **kwargs)
+        if after.timestamp != before.timestamp:
+            yield after
+    yield results[-1]
+    oldest = results[-1].timestamp
+    if start < oldest:
+        before = newest_result(check, start, oldest - 1, status=status,
+                               **kwargs)
+        if before:
+            yield before
+
+
+def outages_from_states(states):
+    """Create outages from the state intervals of a check.
+
+    Args:
+        states (list): the intervals returned by the ``summary.outage``
+            endpoint, oldest first, as dicts with ``status``, ``timefrom``
+            and ``timeto`` keys.
+
+    Yields:
+        Outage: an outage for each interval the check was down.
+    """
+    for n, state in enumerate(states):
+        if state['status'] != ResultType.DOWN.value:
+            continue
+        before = states[n - 1] if n > 0 else None
+        after = states[n + 1] if n + 1 < len(states) else None
+        yield Outage(
+            start=state['timefrom'],
+            finish=state['timeto'],
+            before=before['timeto'] if before and before[
+                'status'] == ResultType.UP.value else None,
+            after=after['timefrom'] if after and after[
+                'status'] == ResultType.UP.value else None)
 
 
 def outages_from_results(results, group_by=None):
     ranges = group_by_range(
         results,
-        lambda r: r.type == ResultType.DOWN,
+        lambda r: r.code == DOWN_CODE,
         group_by)
     for after, data, before in ranges:
-        if before and before.type == ResultType.UNCONFIRMED:
+        if before and before.code == UNCONFIRMED_CODE:
             data.append(before)  # include the unconfirmed down
         first = data[-1]
         last = data[0]
@@ -101,32 +493,585 @@ def outages_from_results(results, group_by=None):
         if group_by:
             meta = {'group': group_by(data[0])}
         yield Outage(
-            start=first.time,
-            finish=last.time,
-            before=before.time if before else None,
-            after=after.time if after else None,
+            start=first.timestamp,
+            finish=last.timestamp,
+            before=before.timestamp if before else None,
+            after=after.timestamp if after else None,
             meta=meta)
 
 
+def outages_from_columns(times, statuses):
+    """Create outages from the columns of a check's results.
+
+    Finds the same outages as :func:`outages_from_results` in the
+    columns of an :class:`~uptime_report.store.archive.ArchiveStore`,
+    without creating a result for each row. When :mod:`numpy` is
+    installed the columns are scanned by :func:`outages_from_arrays`.
+
+    Args:
+        times (sequence): the result timestamps, oldest first.
+        statuses (sequence): the result status codes, see
+            :data:`~uptime_report.store.archive.STATUSES`.
+
+    Returns:
+        iterable: an outage for each run of DOWN results, newest first.
+    """
+    if numpy is not None:
+        return outages_from_arrays(times, statuses)
+    return scan_columns(times, statuses)
+
+
+def scan_columns(times, statuses):
+    """Find the outages of :func:`outages_from_columns` row by row."""
+    down = STATUSES.index(ResultType.DOWN.value)
+    unconfirmed = STATUSES.index(ResultType.UNCONFIRMED.value)
+    count = len(times)
+    last = None  # the newest result of the current run
+    for n in range(count - 1, -2, -1):  # newest first, like results
+        is_down = n >= 0 and statuses[n] == down
+        if is_down and last is None:
+            last = n
+        elif not is_down and last is not None:
+            before = times[n] if n >= 0 else None
+            start = times[n + 1]
+            if n >= 0 and statuses[n] == unconfirmed:
+                start = before  # include the unconfirmed down
+            yield Outage(
+                start=start,
+                finish=times[last],
+                before=before,
+                after=times[last + 1] if last + 1 < count else None)
+            last = None
+
+
+def outages_from_quorum(rows, quorum, window=300):
+    """Create outages from results confirmed by a quorum of probes.
+
+    A probe is down from a DOWN result until its next UP result or until
+    ``window`` seconds pass without another DOWN result from it. There is
+    an outage while at least ``quorum`` distinct probes are down, so that
+    DOWN results of a single probe do not count as downtime. The state of
+    each probe is kept in arrays indexed by the order the probes were
+    first seen, so the rows are scanned in one pass.
+
+    Args:
+        rows (iterable): ``(time, status, probe)`` tuples of the results
+            of a check, oldest first, where ``status`` is a status code,
+            see :data:`RESULT_TYPES`.
+        quorum (int): how many probes must be down for an outage.
+        window (int): how many seconds a DOWN result counts for.
+
+    Yields:
+        Outage: an outage for each time span the quorum was down, oldest
+        first. An outage starts with the first DOWN result of the probes
+        in the quorum and finishes with the last DOWN result before the
+        quorum was lost. It is preceded by the last UP result before its
+        start and followed by the UP result that broke the quorum, if any.
+    """
+    slots = {}          # probe ID -> index of its state
+    last_down = array(TIME_TYPECODE)   # last DOWN result, or -1 if up
+    first_down = array(TIME_TYPECODE)  # first DOWN result of the run
+    up_before = array(TIME_TYPECODE)   # last UP result before the run
+    expiring = deque()  # (time, slot) of DOWN results, oldest first
+    down = 0            # how many probes are down
+    start = before = latest = None
+    last_up = -1
+    for time_, status, probe in rows:
+        slot = slots.get(probe)
+        if slot is None:
+            slot = slots[probe] = len(slots)
+            last_down.append(-1)
+            first_down.append(-1)
+            up_before.append(-1)
+        while expiring and expiring[0][0] <= time_ - window:
+            expired, other = expiring.popleft()
+            if last_down[other] == expired:
+                last_down[other] = -1
+                down -= 1
+        if status == DOWN_CODE:
+            if last_down[slot] == -1:
+                first_down[slot] = time_
+                up_before[slot] = last_up
+                down += 1
+            last_down[slot] = time_
+            expiring.append((time_, slot))
+        elif status == UP_CODE:
+            last_up = time_
+            if last_down[slot] != -1:
+                last_down[slot] = -1
+                down -= 1
+        if start is None and down >= quorum:
+            start, first = min((first_down[n], n) for n in range(len(slots))
+                               if last_down[n] != -1)
+            before = up_before[first] if up_before[first] != -1 else None
+        elif start is not None and down < quorum:
+            yield Outage(start=start, finish=latest, before=before,
+                         after=time_ if status == UP_CODE else None)
+            start = None
+        if status == DOWN_CODE:
+            latest = time_
+    if start is not None:
+        yield Outage(start=start, finish=latest, before=before)
+
+
+def outages_from_arrays(times, statuses):
+    """Create outages from result arrays with vectorized operations.
+
+    Finds the same outages as :func:`outages_from_columns`. The start and
+    end of each run of DOWN results, the UNCONFIRMED result preceding it
+    and the results around it are found with array operations, so only
+    the outages themselves are created one at a time. Requires
+    :mod:`numpy`.
+
+    Args:
+        times (array_like): the result timestamps, oldest first.
+        statuses (array_like): the result status codes, see
+            :data:`~uptime_report.store.archive.STATUSES`.
+
+    Returns:
+        list: an outage for each run of DOWN results, newest first.
+    """
+    times = numpy.asarray(times, dtype=numpy.int64)
+    statuses = numpy.asarray(statuses, dtype=numpy.uint8)
+    count = len(times)
+    down = (statuses == STATUSES.index(ResultType.DOWN.value))
+    edges = numpy.diff(numpy.concatenate(
+        ([0], down.view(numpy.int8), [0])))
+    first = numpy.flatnonzero(edges == 1)  # the oldest DOWN of each run
+    end = numpy.flatnonzero(edges == -1)   # the result after each run
+    has_before = first > 0
+    before = numpy.where(has_before, first - 1, 0)
+    unconfirmed = has_before & (
+        statuses[before] == STATUSES.index(ResultType.UNCONFIRMED.value))
+    start = times[numpy.where(unconfirmed, before, first)]
+    finish = times[end - 1]
+    before_time = times[before]
+    after_time = times[numpy.minimum(end, count - 1)]
+    has_after = end < count
+    return [
+        Outage(start=int(start[n]),
+               finish=int(finish[n]),
+               before=int(before_time[n]) if has_before[n] else None,
+               after=int(after_time[n]) if has_after[n] else None)
+        for n in range(len(first) - 1, -1, -1)]
+
+
+def parse_limit(value):
+    """Parse a Pingdom rate limit header.
+
+    Example:
+
+        >>> parse_limit('Remaining: 394 Time until reset: 3589')
+        (394, 3589)
+
+    Returns:
+        tuple: the remaining requests and seconds until the limit is reset,
+        or None if the header cannot be parsed.
+    """
+    numbers = re.findall(r'\d+', value or '')
+    if len(numbers) != 2:
+        return None
+    return tuple(map(int, numbers))
+
+
+@attr.s
+class RateLimiter(object):
+    """Pace requests according to the Pingdom rate limit headers.
+
+    A :class:`~uptime_report.backend_utils.QuotaBucket` is kept for each
+    of :data:`LIMIT_HEADERS`, holding the requests the header reports as
+    remaining. Requests are only delayed once a quota is used up, until it
+    is reset. When ``path`` is set, the buckets are also shared with other
+    processes through lock files at that path.
+    """
+
+    path = attr.ib(default=None)
+    buckets = attr.ib(init=False)
+
+    @buckets.default
+    def new_buckets(self):
+        buckets = {}
+        for header in LIMIT_HEADERS:
+            if self.path:
+                path = '{}.{}'.format(expanduser(self.path), header.lower())
+                buckets[header] = SharedQuotaBucket(path=path)
+            else:
+                buckets[header] = QuotaBucket()
+        return buckets
+
+    def reserve(self):
+        """Reserve a request, return how many seconds to wait before it."""
+        return max(b.reserve() for b in self.buckets.values())
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            log.debug("rate limited, waiting %.3fs", wait)
+            time.sleep(wait)
+        return wait
+
+    def update(self, headers):
+        for header, bucket in self.buckets.items():
+            limit = parse_limit(headers.get(header))
+            if limit is not None:
+                bucket.update(*limit)
+
+
+@attr.s
+class RequestTiming(object):
+    """The timing of a single request to the Pingdom API."""
+
+    method = attr.ib()
+    url = attr.ib()
+    status = attr.ib()
+    elapsed = attr.ib()
+
+
+@attr.s
+class PingdomConnection(object):
+    """A thread-safe, pooled transport for a PingdomLib connection.
+
+    All requests made through the wrapped connection, including those made
+    by the check objects it returns, go through :meth:`request`. Requests
+    share a single :class:`requests.Session` which keeps up to
+    ``pool_size`` connections alive, so TLS sessions are reused across
+    checks, pages and worker threads.
+
+    Requests are paced by ``limiter``, a :class:`RateLimiter`, and retried
+    if Pingdom rejects them for exceeding the rate limit. The API limits
+    reported by Pingdom as well as the number of requests and their timing
+    are recorded as they complete. The most recent timings are kept in
+    ``timings``.
+    """
+
+    connection = attr.ib()
+    pool_size = attr.ib(default=10, convert=int)
+    limiter = attr.ib(default=attr.Factory(RateLimiter))
+    shortlimit = attr.ib(init=False, default='')
+    longlimit = attr.ib(init=False, default='')
+    requests = attr.ib(init=False, default=0)
+    elapsed = attr.ib(init=False, default=0.0)
+    timings = attr.ib(init=False, repr=False,
+                      default=attr.Factory(lambda: deque(maxlen=1000)))
+    _lock = attr.ib(init=False, default=attr.Factory(threading.Lock))
+    _session = attr.ib(init=False, repr=False)
+
+    @_session.default
+    def new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size,
+            pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.auth = (self.connection.username, self.connection.password)
+        session.headers['App-Key'] = self.connection.apikey
+        if self.connection.accountemail:
+            session.headers['Account-Email'] = self.connection.accountemail
+        return session
+
+    def __attrs_post_init__(self):
+        self.connection.request = self.request
+
+    def request(self, method, url, parameters=None):
+        # Pingdom expects lowercase booleans
+        params = {
+            name: str(value).lower() if isinstance(value, bool) else value
+            for name, value in iteritems(parameters or {})
+        }
+        key = 'params' if method.upper() in ('GET', 'DELETE') else 'data'
+        for retry in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            response = self._send(method, url, **{key: params})
+            if response.status_code != 429 or retry == MAX_RETRIES:
+                break
+            wait = int(response.headers.get('Retry-After', 2 ** retry))
+            log.warning("%s %s: rate limited, retrying in %ss",
+                        method, response.url, wait)
+            time.sleep(wait)
+        response.raise_for_status()
+        return response
+
+    def _send(self, method, url, **kwargs):
+        started = default_timer()
+        response = self._session.request(
+            method, self.connection.url + url, **kwargs)
+        elapsed = default_timer() - started
+        self.limiter.update(response.headers)
+        with self._lock:
+            self.shortlimit = response.headers.get(
+                'Req-Limit-Short', self.shortlimit)
+            self.longlimit = response.headers.get(
+                'Req-Limit-Long', self.longlimit)
+            self.requests += 1
+            self.elapsed += elapsed
+            self.timings.append(RequestTiming(
+                method, response.url, response.status_code, elapsed))
+        log.debug("%s %s: %s in %.3fs",
+                  method, response.url, response.status_code, elapsed)
+        return response
+
+    def getChecks(self, **kwargs):
+        """Return a page of checks, including their tags."""
+        kwargs['include_tags'] = True
+        response = self.request('GET', 'checks', kwargs)
+        return [PingdomCheck(self.connection, c)
+                for c in response.json()['checks']]
+
+    def close(self):
+        self._session.close()
+
+
+CHECK_FIELDS = ('id', 'name', 'hostname', 'resolution', 'created', 'tags')
+"""tuple: the check metadata kept in a :class:`CheckIndex`."""
+
+
+def check_tags(check):
+    """Return the tag names of a check."""
+    return [t['name'] if isinstance(t, dict) else t
+            for t in getattr(check, 'tags', None) or []]
+
+
+def check_info(check):
+    """Return the metadata of a check as a dict."""
+    info = {f: getattr(check, f, None) for f in CHECK_FIELDS}
+    info['tags'] = check_tags(check)
+    return info
+
+
+def check_matches(check, selector):
+    """Return True if a check matches a selector.
+
+    Selectors are check IDs, ``tag:<name>`` for checks with a tag,
+    ``host:<glob>`` for checks whose hostname matches a glob, or a glob for
+    the check name.
+
+    Example:
+
+        >>> from collections import namedtuple
+        >>> Check = namedtuple('Check', 'id name hostname tags')
+        >>> check = Check(1, 'web', 'example.com', [{'name': 'prod'}])
+        >>> [check_matches(check, s)
+        ...  for s in [1, '2', 'tag:prod', 'host:*.com', 'w*', 'db']]
+        [True, False, True, True, True, False]
+    """
+    selector = '{}'.format(selector).strip()
+    if selector.isdigit():
+        return int(selector) == check.id
+    if selector.startswith('tag:'):
+        return selector[4:] in check_tags(check)
+    if selector.startswith('host:'):
+        return fnmatch(check.hostname or '', selector[5:])
+    return fnmatch(check.name or '', selector)
+
+
+def selectors(value):
+    """Convert a check selection setting to a list of selectors.
+
+    ``'None'`` or an empty setting selects all checks, like None.
+    """
+    value = optional(value)
+    if value is None or isinstance(value, list):
+        return value or None
+    if isinstance(value, string_types):
+        return [s.strip() for s in value.split(',') if s.strip()]
+    return list(value)
+
+
+def optional(value):
+    """Convert an optional setting, where ``'None'`` or empty is unset.
+
+    Example:
+
+        >>> optional('None') is None
+        True
+        >>> optional(' ~/.cache ')
+        '~/.cache'
+    """
+    if isinstance(value, string_types):
+        value = value.strip()
+        if value in ('', 'None'):
+            return None
+    return value
+
+
+def boolean(value):
+    """Convert a setting to a bool, accepting strings like ``'False'``."""
+    if isinstance(value, string_types):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+class MissingResults(ValueError):
+    """Raised when the result store does not cover an offline report.
+
+    Attributes:
+        gaps (list): ``(check, start, finish)`` tuples of the windows the
+            store is missing, newest first for each check.
+    """
+
+    def __init__(self, gaps):
+        self.gaps = gaps
+        super(MissingResults, self).__init__(
+            "The result store is missing {} windows:\n{}".format(
+                len(gaps), "\n".join(
+                    "  check {} ({}): {} - {}".format(
+                        check.id, check.name,
+                        arrow.get(start).isoformat(),
+                        arrow.get(finish).isoformat())
+                    for check, start, finish in gaps)))
+
+
+@attr.s
+class CheckIndex(object):
+    """A local index of check metadata.
+
+    The index is kept as JSON in the file at ``path`` and is considered
+    stale ``ttl`` seconds after it was saved.
+    """
+
+    path = attr.ib()
+    ttl = attr.ib(default=3600, convert=int)
+
+    def load(self, stale=False):
+        """Return the indexed check metadata, or None if it is stale.
+
+        Stale metadata is returned too if ``stale`` is True.
+        """
+        try:
+            with open(self.path) as fp:
+                data = json.load(fp)
+        except (IOError, ValueError):
+            return None
+        if not stale and data.get('updated', 0) + self.ttl < time.time():
+            return None
+        return data['checks']
+
+    def save(self, checks):
+        """Index the metadata of a list of checks."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.path, 'w') as fp:
+            json.dump({'updated': time.time(),
+                       'checks': [check_info(c) for c in checks]}, fp)
+
+
+class OutageMode(enum.Enum):
+    """How the Pingdom backend fetches the results to find outages in.
+
+    Attributes:
+        RESULTS (str): ``results``, fetch all results.
+        FILTERED (str): ``filtered``, fetch only DOWN and UNCONFIRMED
+            results and query the results around them, see
+            :func:`with_boundaries`.
+        SUMMARY (str): ``summary``, fetch the state changes of each check
+            instead of results, see :func:`outages_from_states`. This
+            takes a single request per check but has no probe details.
+    """
+
+    RESULTS = 'results'
+    FILTERED = 'filtered'
+    SUMMARY = 'summary'
+
+
 @attr.s
 class PingdomBackend(object):
     username = attr.ib()
     password = attr.ib()
     apikey = attr.ib()
     include_ok = attr.ib(default=False)
+    concurrency = attr.ib(default=1, convert=int)
+    pool_size = attr.ib(default=10, convert=int)
+    prefetch = attr.ib(default=0, convert=int)
+    rate_limit_file = attr.ib(default=None, convert=optional)
+    outage_mode = attr.ib(
+        default=OutageMode.RESULTS.value,
+        validator=in_([m.value for m in OutageMode]))
+    checks = attr.ib(default=None, convert=selectors)
+    cache_dir = attr.ib(default=None, convert=optional)
+    check_ttl = attr.ib(default=3600, convert=int)
+    page_ttl = attr.ib(default=300, convert=int)
+    cache_size = attr.ib(default=256 * 2 ** 20, convert=int)
+    sync_interval = attr.ib(default=300, convert=int)
+    sync_history = attr.ib(default=30, convert=int)
+    sync_budget = attr.ib(default=100, convert=int)
+    store_path = attr.ib(default=None, convert=optional)
+    store_type = attr.ib(default=DEFAULT_STORE)
+    offline = attr.ib(default=False, convert=boolean)
+    quorum = attr.ib(default=0, convert=int)
+    quorum_window = attr.ib(default=300, convert=int)
     _connection = attr.ib(init=False)
+    _check_index = attr.ib(init=False)
+    _store = attr.ib(init=False, repr=False)
+    _page_cache = attr.ib(init=False, repr=False)
 
     @_connection.default
     def new_connection(self):
-        return Pingdom(
+        limiter = RateLimiter(path=self.rate_limit_file)
+        return PingdomConnection(Pingdom(
             self.username,
             self.password,
-            self.apikey)
+            self.apikey), pool_size=self.pool_size, limiter=limiter)
+
+    @_check_index.default
+    def new_check_index(self):
+        if not self.cache_dir:
+            return None
+        path = os.path.join(expanduser(self.cache_dir), 'pingdom-checks.json')
+        return CheckIndex(path, ttl=self.check_ttl)
+
+    @_page_cache.default
+    def new_page_cache(self):
+        if not self.cache_dir:
+            return None
+        path = os.path.join(expanduser(self.cache_dir), 'pingdom-pages')
+        return PageCache(path, ttl=self.page_ttl, max_bytes=self.cache_size)
+
+    @_store.default
+    def new_store(self):
+        if not self.store_path:
+            return None
+        return open_store(self.store_path, self.store_type)
 
     def get_checks(self):
-        return offset_iter(self._connection.getChecks)
+        """Iterate over all checks.
+
+        When a ``cache_dir`` is configured the check listing is fetched at
+        most once every ``check_ttl`` seconds and kept in a
+        :class:`CheckIndex`. When ``offline`` is set, the index is used
+        however old it is.
+
+        Raises:
+            ValueError: if ``offline`` is set and there is no index.
+        """
+        index = self._check_index
+        infos = index.load(stale=self.offline) if index else None
+        if infos is None and self.offline:
+            raise ValueError("Offline reports need the check index in "
+                             "cache_dir, run sync with a cache_dir first")
+        if infos is None:
+            checks = offset_iter(self._connection.getChecks,
+                                 prefetch=self.prefetch)
+            if not index:
+                return checks
+            checks = list(checks)
+            index.save(checks)
+            return iter(checks)
+        log.debug("%s: using %s indexed checks", self, len(infos))
+        return (PingdomCheck(self._connection.connection, info)
+                for info in infos)
+
+    def select_checks(self, checks=None):
+        """Iterate over the selected checks.
+
+        :param checks: list, selectors as in :func:`check_matches`,
+            defaults to the ``checks`` setting, or all checks if unset.
+        """
+        checks = selectors(checks) or self.checks
+        return (check for check in self.get_checks()
+                if not checks or any(check_matches(check, s) for s in checks))
 
-    @continue_offset
     def get_results(self, start=None, finish=None,
                     status=None, checks=None, *args, **kwargs):
         """Iterate over results in the given timeframe.
@@ -134,28 +1079,441 @@ class PingdomBackend(object):
         :param start: int, timestamp
         :param finish: int, timestamp
         :param status: list, a list of uptime_report.outage.ResultType values
-        :param checks: list, a list of check IDs
+        :param checks: list, check selectors, see :meth:`select_checks`
+
+        The timeframe of each check is split into windows that fit under
+        the offset cap, see :func:`window_size`. When the backend
+        ``concurrency`` is more than one, windows are fetched in parallel.
+        The results of each check are yielded together, newest first, in
+        the order the checks were listed. When ``prefetch`` is set, that
+        many pages of a window are fetched ahead, see
+        :func:`~uptime_report.backend_utils.prefetch_pages`. When a
+        ``cache_dir`` is configured, pages are kept in a
+        :class:`~uptime_report.cache.PageCache`, see :func:`check_results`.
+
+        When a ``store_path`` is configured and the timeframe is bounded,
+        results are served by :meth:`get_stored_results`. When ``offline``
+        is set, they are always served from the store, see
+        :meth:`missing`.
+        """
+        if self.offline or (
+                self._store is not None and None not in (start, finish)):
+            return self.get_stored_results(
+                start, finish, status, checks, *args, **kwargs)
+        return self._get_results(start, finish, status, checks,
+                                 *args, **kwargs)
+
+    def _get_results(self, start, finish, status, checks, *args, **kwargs):
+        for check, window, items in self._get_window_items(
+                start, finish, status, checks, *args, **kwargs):
+            for result in make_results(check, items):
+                yield result
+            log.debug("%s: processed check %s window %s: %s results",
+                      self, check, window, len(items))
+        self.log_cache_stats()
+
+    def get_result_batches(self, start=None, finish=None,
+                           status=None, checks=None, *args, **kwargs):
+        """Iterate over results in the given timeframe as batches.
+
+        Like :meth:`get_results`, but yields a :class:`ResultBatch` for
+        each window of each check instead of single results, so outages
+        and statistics can be computed a batch at a time. Results served
+        by the store are read as one batch per check.
+        """
+        if self.offline or (
+                self._store is not None and None not in (start, finish)):
+            if status is not None:
+                status = [s.value for s in status]
+            for check, _ in self.update_store(start, finish, checks,
+                                              *args, **kwargs):
+                yield ResultBatch.from_rows(check, self._store.results(
+                    check.id, start, finish, status))
+            return
+        for check, _, items in self._get_window_items(
+                start, finish, status, checks, *args, **kwargs):
+            yield ResultBatch.from_items(check, items)
+
+    def _get_window_items(self, start, finish, status, checks,
+                          *args, **kwargs):
+        """Fetch the API results of the selected checks window by window.
+
+        Windows are planned and fetched as described in
+        :meth:`get_results`.
+
+        Yields:
+            tuple: the check, the ``(start, finish)`` window and a list of
+            its API results, newest first.
         """
         if status is not None:
             kwargs['status'] = ",".join(s.value for s in status)
-        for check in self.get_checks():
-            if checks and check.id not in checks:
-                continue
+        kwargs.setdefault('prefetch', self.prefetch)
+        kwargs.setdefault('cache', self._page_cache)
+
+        def plan(check):
             log.debug("%s: processing check %s", self, check)
-            getter = partial(
-                check_results, check, start=start, finish=finish)
-            n = 0
-            for n, result in enumerate(offset_iter(getter, *args, **kwargs)):
+            if start is None or finish is None:
+                return [(start, finish)]
+            return split_range(start, finish, window_size(check))
+
+        def fetch(work):
+            check, (window_start, window_finish) = work
+            if window_start is None or window_finish is None:
+                getter = partial(check_items, check,
+                                 start=window_start, finish=window_finish)
+                return list(offset_iter(getter, *args, **kwargs))
+            return window_items(
+                check, window_start, window_finish,
+                window_finish == finish, *args, **kwargs)
+
+        work = ((check, window) for check in self.select_checks(checks)
+                for window in plan(check))
+        for (check, window), items in concurrent_iter(
+                fetch, work, concurrency=self.concurrency):
+            yield check, window, items
+
+    def log_cache_stats(self):
+        """Log the page cache counters at info level, if there is a cache.
+
+        See :meth:`~uptime_report.cache.PageCache.log_stats`.
+        """
+        if self._page_cache is not None:
+            self._page_cache.log_stats()
+
+    @property
+    def requests(self):
+        """int: how many API requests the backend has sent."""
+        return self._connection.requests
+
+    def coverage(self, check):
+        """Return the :class:`~uptime_report.store.Coverage` of a check."""
+        return self._store.coverage(check.id)
+
+    def missing(self, start, finish, checks=None):
+        """Return the windows of a timeframe the store does not cover.
+
+        Parameters are like :meth:`get_results`.
+
+        Returns:
+            list: ``(check, start, finish)`` tuples, see
+            :class:`MissingResults`.
+
+        Raises:
+            ValueError: if no ``store_path`` is configured or the
+                timeframe is not bounded.
+        """
+        if self._store is None:
+            raise ValueError("Offline reports need a store_path")
+        if None in (start, finish):
+            raise ValueError("Offline reports need a start and finish")
+        return [(check, gap[0], gap[1])
+                for check in self.select_checks(checks)
+                for gap in self.coverage(check).gaps(start, finish)]
+
+    def require_coverage(self, start, finish, checks=None):
+        """Check the store covers a timeframe, see :meth:`missing`.
+
+        Raises:
+            MissingResults: if the store does not cover the timeframe.
+        """
+        gaps = self.missing(start, finish, checks)
+        if gaps:
+            raise MissingResults(gaps)
+
+    def update_store(self, start, finish, checks=None, *args, **kwargs):
+        """Fetch the results the store does not cover and add them to it.
+
+        Only the parts of the timeframe that the store does not cover are
+        fetched, in windows like :meth:`get_results`. Results newer than
+        :data:`SETTLE_TIME` are stored but their range is not marked as
+        covered, so it is fetched again next time. Parameters are like
+        :meth:`get_results`.
+
+        Yields:
+            tuple: each selected check, once its results are stored, and
+            the number of results fetched for it.
+
+        Raises:
+            MissingResults: if ``offline`` is set and the store does not
+                cover the timeframe, before any check is yielded.
+        """
+        if self.offline:
+            self.require_coverage(start, finish, checks)
+            return ((check, 0) for check in self.select_checks(checks))
+        return self.store_checks(self.select_checks(checks), start, finish,
+                                 *args, **kwargs)
+
+    def store_checks(self, checks, start, finish, *args, **kwargs):
+        """Like :meth:`update_store`, given a list of check objects."""
+        store = self._store
+        horizon = min(finish, int(time.time()) - SETTLE_TIME)
+        kwargs.setdefault('prefetch', self.prefetch)
+        kwargs.setdefault('cache', self._page_cache)
+
+        def plan(check):
+            windows = [
+                window
+                for gap in store.coverage(check.id).gaps(start, finish)
+                for window in split_range(gap[0], gap[1], window_size(check))]
+            log.debug("%s: check %s has %s windows to fetch",
+                      self, check, len(windows))
+            return windows or [None]
+
+        def fetch(work):
+            check, window = work
+            if window is None:
+                return []
+            return check_window(check, window[0], window[1], True,
+                                *args, **kwargs)
+
+        work = ((check, window) for check in checks
+                for window in plan(check))
+        done = concurrent_iter(fetch, work, concurrency=self.concurrency)
+        for check, windows in groupby(done, key=lambda w: w[0][0]):
+            fetched = 0
+            for (_, window), results in windows:
+                if window is not None:
+                    fetched += len(results)
+                    store.add(check.id, window[0], min(window[1], horizon),
+                              map(result_row, results))
+            yield check, fetched
+        self.log_cache_stats()
+
+    def sync(self, start, finish, checks=None, *args, **kwargs):
+        """Fetch the results the store does not cover in a timeframe.
+
+        See :meth:`update_store`. Each window is stored as soon as it is
+        fetched, so an interrupted sync resumes where it stopped.
+
+        Returns:
+            dict: the number of ``checks`` synced, ``results`` fetched and
+            ``requests`` made, and the ``seconds`` it took.
+
+        Raises:
+            ValueError: if no ``store_path`` is configured.
+        """
+        if self._store is None:
+            raise ValueError("A store_path is required to sync results")
+        requests = self.requests
+        started = default_timer()
+        stats = {'checks': 0, 'results': 0}
+        for check, fetched in self.update_store(start, finish, checks,
+                                                *args, **kwargs):
+            log.info("synced %s results of check %s", fetched, check.id)
+            stats['checks'] += 1
+            stats['results'] += fetched
+        stats['requests'] = self.requests - requests
+        stats['seconds'] = default_timer() - started
+        return stats
+
+    def get_stored_results(self, start, finish, status=None, checks=None,
+                           *args, **kwargs):
+        """Iterate over results in the given timeframe using the store.
+
+        The store is updated with :meth:`update_store` and the results of
+        each check are then read back from it. Parameters are like
+        :meth:`get_results`.
+        """
+        if status is not None:
+            status = [s.value for s in status]
+        for check, _ in self.update_store(start, finish, checks,
+                                          *args, **kwargs):
+            for row in self._store.results(check.id, start, finish, status):
+                yield row_result(check, row)
+
+    def get_archived_outages(self, start, finish, checks=None,
+                             *args, **kwargs):
+        """Iterate over outages found in the columns of stored results.
+
+        The store is updated with :meth:`update_store` and the outages of
+        each check are found in the columns of its stored results, without
+        creating results, see :func:`outages_from_columns`. Columns are
+        read from an archive store, or built from the stored rows when
+        :mod:`numpy` is installed. Parameters are like :meth:`get_results`.
+        """
+        for _, outages in self.archived_check_outages(
+                start, finish, checks, *args, **kwargs):
+            for outage in outages:
+                yield outage
+
+    def archived_check_outages(self, start, finish, checks=None,
+                               *args, **kwargs):
+        """Like :meth:`get_archived_outages`, grouped by check.
+
+        Yields:
+            tuple: each check and its outages, newest first.
+        """
+        codes = {status: code for code, status in enumerate(STATUSES)}
+        for check, _ in self.update_store(start, finish, checks,
+                                          *args, **kwargs):
+            if hasattr(self._store, 'columns'):
+                columns = self._store.columns(check.id, start, finish)
+                times, statuses = columns.time, columns.status
+            else:
+                rows = self._store.results(check.id, start, finish)[::-1]
+                times = numpy.fromiter(
+                    (r[0] for r in rows), numpy.int64, len(rows))
+                statuses = numpy.fromiter(
+                    (codes[r[1]] for r in rows), numpy.uint8, len(rows))
+            yield check, outages_from_columns(times, statuses)
+
+    def get_filtered_results(self, start=None, finish=None, checks=None,
+                             *args, **kwargs):
+        """Iterate over the results that matter for finding outages.
+
+        Only DOWN and UNCONFIRMED results are fetched, along with the
+        results around each contiguous run of them, see
+        :func:`with_boundaries`. Parameters are like :meth:`get_results`.
+        """
+        finish = finish or arrow.utcnow().timestamp
+        start = start or finish - 24 * 60 * 60
+        down = self.get_results(
+            start=start, finish=finish, checks=checks,
+            status=[ResultType.DOWN, ResultType.UNCONFIRMED],
+            *args, **kwargs)
+        by_check = ((check, list(results)) for check, results in
+                    groupby(down, key=attrgetter('check')))
+
+        def fetch(item):
+            check, results = item
+            return with_boundaries(check, results, start, finish,
+                                   cache=self._page_cache)
+
+        for _, results in concurrent_iter(
+                fetch, by_check, concurrency=self.concurrency):
+            for result in results:
                 yield result
+        self.log_cache_stats()
+
+    def get_summary_outages(self, start=None, finish=None, checks=None):
+        """Iterate over outages built from the state changes of checks.
+
+        Parameters are like :meth:`get_results`.
+        """
+        for _, outages in self.summary_check_outages(start, finish, checks):
+            for outage in outages:
+                yield outage
 
-            log.debug("%s: processed check %s: %s results", self, check, n)
+    def summary_check_outages(self, start=None, finish=None, checks=None):
+        """Like :meth:`get_summary_outages`, grouped by check.
+
+        Yields:
+            tuple: each check and its outages, oldest first.
+        """
+        def fetch(check):
+            log.debug("%s: processing check %s", self, check)
+            states = check.outages(time_from=start, time_to=finish)
+            return outages_from_states(states)
+
+        return concurrent_iter(fetch, self.select_checks(checks),
+                               concurrency=self.concurrency)
+
+    def get_check_outages(self, *args, **kwargs):
+        """Iterate over the selected checks and their outages.
+
+        Outages are found as set by ``outage_mode``, see
+        :class:`OutageMode`, or by :meth:`quorum_check_outages` when a
+        ``quorum`` is set. Parameters are like :meth:`get_results`.
+
+        Yields:
+            tuple: each check and an iterable of its outages.
+        """
+        if self.quorum > 0:
+            return self.quorum_check_outages(*args, **kwargs)
+        mode = OutageMode(self.outage_mode)
+        if self.offline:
+            mode = OutageMode.RESULTS  # the other modes need the API
+        if mode == OutageMode.SUMMARY:
+            return self.summary_check_outages(*args, **kwargs)
+        if (mode == OutageMode.RESULTS and self._store is not None and
+                (hasattr(self._store, 'columns') or numpy is not None) and
+                None not in (kwargs.get('start'), kwargs.get('finish'))):
+            return self.archived_check_outages(*args, **kwargs)
+        if mode == OutageMode.FILTERED:
+            results = self.get_filtered_results(*args, **kwargs)
+        else:
+            results = self.get_results(*args, **kwargs)
+        return ((check, outages_from_results(check_results))
+                for check, check_results in groupby(
+                    results, key=attrgetter('check')))
+
+    def quorum_check_outages(self, *args, **kwargs):
+        """Iterate over the selected checks and their quorum outages.
+
+        The results of each check are fetched as batches, see
+        :meth:`get_result_batches`, and scanned oldest first for the times
+        at least ``quorum`` probes reported DOWN within ``quorum_window``
+        seconds, see :func:`outages_from_quorum`. Parameters are like
+        :meth:`get_results`.
+
+        Yields:
+            tuple: each check and a list of its outages, oldest first.
+        """
+        batches = self.get_result_batches(*args, **kwargs)
+        for check, check_batches in groupby(batches,
+                                            key=attrgetter('check')):
+            check_batches = list(check_batches)[::-1]
+            rows = (row for batch in check_batches
+                    for row in zip(batch.time[::-1], batch.status[::-1],
+                                   batch.probe[::-1]))
+            yield check, list(outages_from_quorum(
+                rows, self.quorum, self.quorum_window))
+
+    def get_outage_streams(self, *args, **kwargs):
+        """Iterate over the outages of each selected check, oldest first.
+
+        Parameters are like :meth:`get_results`. With ``include_ok`` set,
+        each outage finishes with the next UP result. The outages of each
+        check are collected in a list and sorted, so merging the streams,
+        which starts all of them, holds every outage in memory.
+
+        Yields:
+            list: the outages of each check, sorted by start.
+        """
+        for _, outages in self.get_check_outages(*args, **kwargs):
+            stream = []
+            for outage in outages:
+                if outage.after_epoch is not None and self.include_ok:
+                    outage.finish = outage.after_epoch
+                stream.append(outage)
+            stream.sort(key=start_timestamp)
+            yield stream
 
     def get_outages(self, *args, **kwargs):
-        results = self.get_results(checks=[173494], *args, **kwargs)
-        for outage in outages_from_results(results):
-            if outage.after and self.include_ok:
-                outage.finish = outage.after
-            yield outage
+        """Return the outages of the selected checks.
+
+        Parameters are like :meth:`get_results`.
+
+        Returns:
+            OutageStreams: the outages of each check, oldest first, see
+            :meth:`get_outage_streams`.
+        """
+        return OutageStreams(self.get_outage_streams(*args, **kwargs))
+
+    def compact(self):
+        """Compact the local page cache and result store.
+
+        Pages that expired and pages of windows the result store covers
+        are dropped from the page cache, which is then evicted down to its
+        budget. Stores that support it are compacted too.
+        """
+        store = self._store
+        coverage = {}
+
+        def superseded(key):
+            if store is None or key[0] != 'results' or None in key[2:4]:
+                return False
+            check_id, start, finish = key[1:4]
+            if check_id not in coverage:
+                coverage[check_id] = store.coverage(check_id)
+            return not coverage[check_id].gaps(start, finish)
+
+        if self._page_cache is not None:
+            removed = self._page_cache.compact(superseded)
+            log.info("dropped %s cached pages", removed)
+        self.log_cache_stats()
+        if hasattr(store, 'compact'):
+            store.compact()
 
     @classmethod
     def defaults(cls):
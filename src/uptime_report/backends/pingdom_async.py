@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous Pingdom backend for uptime data.
+
+This backend talks to the Pingdom API directly using `aiohttp`_ so that
+many page requests can be in flight at once on a single thread. It
+requires Python 3.6 or later.
+
+.. _aiohttp:
+   https://aiohttp.readthedocs.io/
+"""
+import asyncio
+import logging
+from itertools import chain
+
+import attr
+from uptime_report.backend_utils import split_range
+from uptime_report.backends.pingdom import (MAX_OFFSET, MaxOffsetReached,
+                                            RateLimiter, check_matches,
+                                            make_result, optional,
+                                            outages_from_results, selectors,
+                                            window_size)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+log = logging.getLogger(__name__)
+
+API_URL = 'https://api.pingdom.com/api/2.0/'
+"""str: base URL of the Pingdom API."""
+
+
+@attr.s
+class Check(object):
+    """A Pingdom check as returned by the ``checks`` endpoint."""
+
+    id = attr.ib()
+    name = attr.ib(default=None)
+    hostname = attr.ib(default=None)
+    resolution = attr.ib(default=None)
+    created = attr.ib(default=None)
+    tags = attr.ib(default=attr.Factory(list))
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**{a.name: data.get(a.name) for a in attr.fields(cls)
+                      if a.name in data})
+
+
+@attr.s
+class AsyncPingdomBackend(object):
+    username = attr.ib()
+    password = attr.ib()
+    apikey = attr.ib()
+    include_ok = attr.ib(default=False)
+    concurrency = attr.ib(default=10, convert=int)
+    limit_per_host = attr.ib(default=10, convert=int)
+    url = attr.ib(default=API_URL)
+    rate_limit_file = attr.ib(default=None, convert=optional)
+    checks = attr.ib(default=None, convert=selectors)
+    _session = attr.ib(init=False, default=None, repr=False)
+    _limiter = attr.ib(init=False, repr=False)
+
+    @_limiter.default
+    def new_limiter(self):
+        return RateLimiter(path=self.rate_limit_file)
+
+    def new_session(self):
+        if aiohttp is None:
+            raise RuntimeError("The aiohttp module is required.")
+        return aiohttp.ClientSession(
+            auth=aiohttp.BasicAuth(self.username, self.password),
+            headers={'App-Key': self.apikey},
+            connector=aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, path, **params):
+        await asyncio.sleep(self._limiter.reserve())
+        async with self._session.get(self.url + path,
+                                     params=params) as response:
+            self._limiter.update(response.headers)
+            response.raise_for_status()
+            return await response.json()
+
+    async def _pages(self, path, key, limit=1000, **params):
+        offset = 0
+        while True:
+            data = await self.request(
+                path, limit=limit, offset=offset, **params)
+            items = data[key]
+            for item in items:
+                yield item
+            if len(items) < limit:
+                break
+            offset += limit
+
+    def _open(self):
+        """Open a session unless one is open, return True if it was."""
+        if self._session is not None:
+            return False
+        self._session = self.new_session()
+        return True
+
+    async def get_checks(self):
+        opened = self._open()
+        try:
+            async for item in self._pages(
+                    'checks', 'checks', include_tags='true'):
+                yield Check.from_json(item)
+        finally:
+            if opened:
+                await self.close()
+
+    async def _window_results(self, check, start, finish, closed=True,
+                              limit=1000, **params):
+        """Return the results of a check in a window, newest first.
+
+        See :func:`~uptime_report.backends.pingdom.check_window`.
+        """
+        if start is not None:
+            params['from'] = start
+        if finish is not None:
+            params['to'] = finish
+        results = []
+        offset = 0
+        while True:
+            if offset > MAX_OFFSET:
+                if start is None or finish is None or finish - start < 2:
+                    raise MaxOffsetReached(offset)
+                middle = (start + finish) // 2
+                log.debug("splitting window %s-%s of check %s at %s",
+                          start, finish, check, middle)
+                parts = await asyncio.gather(
+                    self._window_results(
+                        check, middle, finish, closed, limit, **params),
+                    self._window_results(
+                        check, start, middle, False, limit, **params))
+                return list(chain.from_iterable(parts))
+            data = await self.request(
+                'results/{}'.format(check.id),
+                limit=limit, offset=offset, **params)
+            items = data['results']
+            results.extend(make_result(check, item) for item in items)
+            if len(items) < limit:
+                break
+            offset += limit
+        if closed:
+            return results
+        return [r for r in results if r.timestamp < finish]
+
+    async def _check_results(self, check, start=None, finish=None,
+                             **kwargs):
+        """Return all results of a check, fetching its windows at once."""
+        if start is None or finish is None:
+            windows = [(start, finish)]
+        else:
+            windows = split_range(start, finish, window_size(check))
+        parts = await asyncio.gather(*[
+            self._window_results(
+                check, window_start, window_finish,
+                window_finish == finish, **kwargs)
+            for window_start, window_finish in windows])
+        return list(chain.from_iterable(parts))
+
+    async def get_results(self, start=None, finish=None,
+                          status=None, checks=None, **kwargs):
+        """Iterate over results in the given timeframe.
+
+        Up to ``concurrency`` checks are fetched at once and the results of
+        each check are yielded together, in the order the checks were
+        listed.
+
+        :param start: int, timestamp
+        :param finish: int, timestamp
+        :param status: list, a list of uptime_report.outage.ResultType values
+        :param checks: list, check selectors, see
+            :func:`~uptime_report.backends.pingdom.check_matches`
+        """
+        if status is not None:
+            kwargs['status'] = ",".join(s.value for s in status)
+        checks = selectors(checks) or self.checks
+        opened = self._open()
+        pending = []
+        try:
+            async for check in self.get_checks():
+                if checks and not any(check_matches(check, s)
+                                      for s in checks):
+                    continue
+                log.debug("%s: processing check %s", self, check)
+                pending.append(asyncio.ensure_future(self._check_results(
+                    check, start=start, finish=finish, **kwargs)))
+                if len(pending) >= self.concurrency:
+                    for result in await pending.pop(0):
+                        yield result
+            while pending:
+                for result in await pending.pop(0):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            if opened:
+                await self.close()
+
+    async def get_outages(self, *args, **kwargs):
+        """Iterate over the outages of the selected checks.
+
+        The results of each check are collected as they stream in and its
+        outages are found once the next check starts, so outages never
+        span two checks. Parameters are like :meth:`get_results`.
+        """
+        check, results = None, []
+        async for result in self.get_results(*args, **kwargs):
+            if results and result.check is not check:
+                for outage in self._check_outages(results):
+                    yield outage
+                results = []
+            check = result.check
+            results.append(result)
+        for outage in self._check_outages(results):
+            yield outage
+
+    def _check_outages(self, results):
+        for outage in outages_from_results(results):
+            if outage.after_epoch is not None and self.include_ok:
+                outage.finish = outage.after_epoch
+            yield outage
+
+    @classmethod
+    def defaults(cls):
+        for a in sorted(attr.fields(cls), key=lambda f: f.name):
+            if not a.init:
+                continue
+            yield (a.name, None if a.default == attr.NOTHING else a.default)
+
+    @classmethod
+    def from_config(cls, config=None):
+        return cls(**{a: config[a] for a, _ in cls.defaults() if a in config})
+
+
+backend = AsyncPingdomBackend
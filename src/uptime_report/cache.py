@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Uptime report page cache.
+
+This module contains a cache for pages fetched from a backend API. Each
+page is kept as a zlib compressed JSON file named after a hash of its key,
+along with the key, the time it was stored and whether it is final. Final
+pages never expire, others expire after a TTL. The cache is kept under a
+byte budget by evicting the least recently used pages.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+import attr
+
+log = logging.getLogger(__name__)
+"""cache module logger."""
+
+MISSING = object()
+"""object: returned by :meth:`PageCache.get` for missing entries."""
+
+EVICT_RATIO = 0.9
+"""float: the share of the byte budget kept after an eviction."""
+
+
+@attr.s
+class PageCache(object):
+    """A cache of pages kept as compressed files under a directory.
+
+    Keys are JSON serializable values, usually tuples, and values are JSON
+    serializable data.
+
+    Example:
+
+        >>> import tempfile
+        >>> cache = PageCache(tempfile.mkdtemp())
+        >>> cache.get((1, 'results')) is MISSING
+        True
+        >>> cache.set((1, 'results'), {'results': []}, final=True)
+        >>> cache.get((1, 'results'))
+        {'results': []}
+        >>> (cache.hits, cache.misses)
+        (1, 1)
+
+    Attributes:
+        path (str): the cache directory.
+        ttl (int): how many seconds pages that are not final are kept.
+        max_bytes (int): the byte budget of the cache, or 0 for no limit.
+        hits (int): how many lookups found a page.
+        misses (int): how many lookups found no page or an expired one.
+        evictions (int): how many pages were evicted or dropped.
+    """
+
+    path = attr.ib()
+    ttl = attr.ib(default=300, convert=int)
+    max_bytes = attr.ib(default=0, convert=int)
+    hits = attr.ib(init=False, default=0)
+    misses = attr.ib(init=False, default=0)
+    evictions = attr.ib(init=False, default=0)
+    _size = attr.ib(init=False, default=None, repr=False)
+    _lock = attr.ib(init=False, repr=False,
+                    default=attr.Factory(threading.Lock))
+
+    def _file(self, key):
+        digest = hashlib.sha1(
+            json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest[:2], digest + '.json.z')
+
+    def _files(self):
+        """Yield the path, size and last use of each cached file."""
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _read(self, path):
+        """Return the stored time, final flag, key and value of a page."""
+        with open(path, 'rb') as fp:
+            return json.loads(zlib.decompress(fp.read()).decode('utf-8'))
+
+    def _expired(self, stored, final):
+        return not final and stored + self.ttl < time.time()
+
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._size is not None:
+                self._size -= size
+
+    def get(self, key):
+        """Return a cached value, or :data:`MISSING` if missing or expired.
+
+        A hit marks the page as recently used.
+        """
+        path = self._file(key)
+        try:
+            stored, final, _, value = self._read(path)
+        except (IOError, OSError, TypeError, ValueError, zlib.error):
+            value = MISSING
+        else:
+            if self._expired(stored, final):
+                value = MISSING
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is not MISSING:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+        return value
+
+    def set(self, key, value, final=False):
+        """Store a value in the cache.
+
+        Args:
+            key: the key of the entry.
+            value: the data to store.
+            final (bool, optional): True if the page will never change, so
+                it does not expire.
+        """
+        path = self._file(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+        data = zlib.compress(
+            json.dumps([time.time(), final, key, value]).encode('utf-8'))
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(data)
+        os.rename(tmp, path)
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += len(data) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self, max_bytes=None):
+        """Remove the least recently used pages until under the budget.
+
+        Pages are removed until the cache takes up :data:`EVICT_RATIO` of
+        ``max_bytes``, which defaults to the cache ``max_bytes``.
+
+        Returns:
+            int: how many pages were removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        files = sorted(self._files(), key=lambda f: f[2])
+        size = sum(f[1] for f in files)
+        with self._lock:
+            self._size = size
+        target = int(max_bytes * EVICT_RATIO)
+        removed = 0
+        for path, file_size, _ in files:
+            if size <= target:
+                break
+            self._remove(path, file_size)
+            size -= file_size
+            removed += 1
+        log.debug("%s: evicted %s pages", self.path, removed)
+        return removed
+
+    def compact(self, superseded=None):
+        """Drop pages that can no longer be used and evict to the budget.
+
+        Expired pages, unreadable pages and leftover temporary files are
+        removed, as well as the pages for which ``superseded`` returns
+        True, given the page key.
+
+        Returns:
+            int: how many pages were removed.
+        """
+        removed = 0
+        for path, size, used in list(self._files()):
+            if path.endswith('.tmp') and used + self.ttl > time.time():
+                continue  # may still be written
+            try:
+                stored, final, key, _ = self._read(path)
+                drop = self._expired(stored, final) or bool(
+                    superseded and superseded(key))
+            except (IOError, OSError, TypeError, ValueError, zlib.error):
+                drop = True
+            if drop:
+                self._remove(path, size)
+                removed += 1
+        if self.max_bytes:
+            removed += self.evict()
+        return removed
+
+    def log_stats(self):
+        """Log the cache counters at info level."""
+        log.info("%s: %s hits, %s misses, %s evictions",
+                 self.path, self.hits, self.misses, self.evictions)
@@ -22,15 +22,11 @@ from sigtools import modifiers, wrappers
 from uptime_report._version import get_versions
 from uptime_report.backends import get_backend, list_backends
 from uptime_report.config import read_config, write_config
+from uptime_report.daemon import SyncDaemon
 from uptime_report.format import with_format
 from uptime_report.outage import Outage, get_downtime_in_seconds, get_outages
 from uptime_report.time import get_time
 
-try:
-    import requests_cache
-except ImportError:
-    requests_cache = None
-
 
 log = logging.getLogger(__name__)
 """cli module logger."""
@@ -76,47 +72,68 @@ def get_log_level(level):
 @modifiers.annotate(log_level=get_log_level)
 @modifiers.annotate(kwargs=parser.Parameter.IGNORE)
 def with_common_args(
-        wrapped, log_level=None, use_cache=False, config=DEFAULT_CONFIG,
-        *args, **kwargs):
+        wrapped, log_level=None, config=DEFAULT_CONFIG, *args, **kwargs):
     """Add common CLI arguments to a method.
 
-    Provides ``--log-level``, ``--config`` and ``--use-cache`` options.
+    Provides ``--log-level`` and ``--config`` options.
 
     Args:
         log_level (int): the log level code to configure logging.
-        use_cache (bool): True if you want `requests_cache`_ to be used.
-
-    .. _requests_cache:
-       https://github.com/reclosedev/requests-cache
     """
     logging.basicConfig(level=log_level or logging.ERROR)
-    if use_cache:
-        if requests_cache:
-            requests_cache.install_cache()
-        else:
-            log.warning("Cache disabled, missing requests-cache module.")
     return wrapped(config=read_config(config), *args, **kwargs)
 
 
 @wrappers.decorator
 @modifiers.autokwoargs
 @modifiers.annotate(kwargs=parser.Parameter.IGNORE)
-def with_backend(wrapped, backend=DEFAULT_BACKEND, *args, **kwargs):
-    """Provide ``--backend`` option that initializes a backend.
+def with_backend(
+        wrapped, backend=DEFAULT_BACKEND, checks=None, concurrency=0,
+        outage_mode=None, cache_dir=None, offline=False, quorum=0,
+        *args, **kwargs):
+    """Provide ``--backend`` and backend configuration options.
+
+    Initializes a backend from its configuration section. The other
+    options override the backend configuration if set.
 
     Args:
         backend (str, optional): the name of the backend. Defaults to
             ``'pingdom'``.
+        checks (str, optional): comma separated check IDs, ``tag:<name>``,
+            ``host:<glob>`` or name globs selecting the checks to report on.
+        concurrency (int, optional): how many checks to fetch in parallel.
+        outage_mode (str, optional): how the backend fetches outages, one
+            of ``results``, ``filtered`` or ``summary`` for Pingdom.
+        cache_dir (str, optional): the directory where the backend caches
+            API pages and check metadata.
+        offline (bool, optional): report from the local result store only,
+            without using the network.
+        quorum (int, optional): only report outages when at least this many
+            probes report DOWN within the backend ``quorum_window``.
 
     Raises:
         clize.errors.CliValueError: if the backend configuration is missing
+            or invalid.
     """
     try:
         cfg = kwargs.get('config', {})[backend]
     except (TypeError, KeyError):
         raise errors.CliValueError(
             "Missing configuration for backend {}".format(backend))
-    impl = get_backend(backend).from_config(cfg)
+    overrides = {k: v for k, v in [
+        ('checks', checks),
+        ('concurrency', concurrency),
+        ('outage_mode', outage_mode),
+        ('cache_dir', cache_dir),
+        ('offline', offline),
+        ('quorum', quorum)] if v}
+    if overrides:
+        cfg = dict(cfg, **overrides)
+    try:
+        impl = get_backend(backend).from_config(cfg)
+    except (TypeError, ValueError) as e:
+        raise errors.CliValueError(
+            "Invalid configuration for backend {}: {}".format(backend, e))
     return wrapped(backend=impl, *args, **kwargs)
 
 
@@ -152,6 +169,40 @@ def with_filters(
     return wrapped(filters=filters, *args, **kwargs)
 
 
+@wrappers.decorator
+@modifiers.autokwoargs
+@modifiers.annotate(start=get_time, finish=get_time)
+@modifiers.annotate(kwargs=parser.Parameter.IGNORE)
+def with_timeframe(wrapped, start, finish, *args, **kwargs):
+    """Provide start and finish arguments.
+
+    Args:
+        start (str): the start time in a string parseable by
+            :py:func:`get_time`.
+        finish (str): the finish time in a string parseable by
+            :py:func:`get_time`.
+
+    Raises:
+        clize.errors.CliValueError: if one of the values cannot be converted.
+    """
+    return wrapped(start=start, finish=finish, *args, **kwargs)
+
+
+def check_offline(backend, filters):
+    """Fail unless an offline backend can report on a timeframe.
+
+    Raises:
+        clize.errors.CliValueError: if the backend is offline and its store
+            does not cover the timeframe, listing the missing windows.
+    """
+    if not getattr(backend, 'offline', False):
+        return
+    try:
+        backend.require_coverage(filters['start'], filters['finish'])
+    except ValueError as e:
+        raise errors.CliValueError(e)
+
+
 @with_common_args
 @with_filters
 @with_backend
@@ -165,6 +216,7 @@ def outages(filters=None, backend=None, fmt=None, config=None):
         fmt (Format): what format to output data as.
         config (dict): the settings object
     """
+    check_offline(backend, filters)
     outages = get_outages(backend, **filters)
     try:
         cfg = config[fmt.value]
@@ -177,13 +229,83 @@ def outages(filters=None, backend=None, fmt=None, config=None):
 @with_common_args
 @with_filters
 @with_backend
-def uptime(filters=None, backend=None):
+def uptime(filters=None, backend=None, config=None):
     """Do the uptime reporting stuff."""
+    check_offline(backend, filters)
     outages = get_outages(backend, **filters)
     downtime = get_downtime_in_seconds(outages)
     print(downtime)
 
 
+@with_common_args
+@with_backend
+def compact(backend=None, config=None):
+    """Compact the local caches of a backend.
+
+    Drops cached pages that expired or that the result store covers, and
+    evicts cached pages down to the backend ``cache_size``.
+
+    Args:
+        backend (object): the backend instance object
+        config (dict): the settings object
+    """
+    if not hasattr(backend, 'compact'):
+        raise errors.CliValueError("The backend has no local caches")
+    backend.compact()
+
+
+@with_common_args
+@with_timeframe
+@with_backend
+def sync(start=None, finish=None, backend=None, config=None):
+    """Fetch results into the local store of a backend.
+
+    Only the windows the store does not cover are fetched, so an
+    interrupted sync can be resumed by running it again. Prints the
+    throughput once done.
+
+    Args:
+        start (int): the start timestamp.
+        finish (int): the finish timestamp.
+        backend (object): the backend instance object
+        config (dict): the settings object
+    """
+    if not hasattr(backend, 'sync'):
+        raise errors.CliValueError("The backend has no local store")
+    try:
+        stats = backend.sync(start, finish)
+    except ValueError as e:
+        raise errors.CliValueError(e)
+    seconds = max(stats['seconds'], 1e-6)
+    print("synced {} results of {} checks in {:.1f}s: "
+          "{:.1f} results/s, {:.1f} requests/s".format(
+              stats['results'], stats['checks'], stats['seconds'],
+              stats['results'] / seconds, stats['requests'] / seconds))
+
+
+@with_common_args
+@with_backend
+def daemon(backend=None, config=None):
+    """Keep the local store of a backend current.
+
+    Polls each check for new results every ``sync_interval`` seconds and
+    backfills the last ``sync_history`` days in the background, using at
+    most ``sync_budget`` requests per hour to do so. Runs until
+    interrupted.
+
+    Args:
+        backend (object): the backend instance object
+        config (dict): the settings object
+    """
+    if not getattr(backend, 'store_path', None):
+        raise errors.CliValueError("The backend has no local store")
+    SyncDaemon(backend,
+               interval=backend.sync_interval,
+               history=backend.sync_history * 24 * 60 * 60,
+               budget=backend.sync_budget,
+               list_interval=backend.check_ttl).run()
+
+
 def version():
     """Get the version of this program."""
     return get_versions().get('version', 'unknown')
@@ -196,7 +318,8 @@ def backends():
 
 def main(**kwargs):
     """Run the CLI application."""
-    run([uptime, outages, write_config], alt=[version, backends], **kwargs)
+    run([uptime, outages, sync, daemon, compact, write_config],
+        alt=[version, backends], **kwargs)
 
 
 if __name__ == '__main__':
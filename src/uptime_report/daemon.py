@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Uptime report sync daemon.
+
+This module keeps the local result store of the Pingdom backend current,
+so that reports can be computed from the store. See :class:`SyncDaemon`.
+"""
+import logging
+import time
+from collections import deque
+
+import attr
+from uptime_report.backends.pingdom import (SETTLE_TIME, check_resolution,
+                                            window_size)
+
+log = logging.getLogger(__name__)
+"""daemon module logger."""
+
+BUDGET_PERIOD = 3600
+"""int: the period of the backfill request budget, in seconds."""
+
+
+@attr.s
+class SyncDaemon(object):
+    """Keep the result store of a backend current.
+
+    Each check is polled for the results since the end of its stored
+    coverage every ``interval`` seconds, or every time it runs if it runs
+    less often. Polls are spread over the interval. Between polls, older
+    gaps in the last ``history`` seconds are backfilled newest first, one
+    window at a time, as long as fewer than ``budget`` requests were spent
+    on backfilling in the last :data:`BUDGET_PERIOD`.
+
+    Attributes:
+        backend: a backend with a result store, such as
+            :class:`~uptime_report.backends.pingdom.PingdomBackend`.
+        interval (int): the minimum time between polls of a check.
+        history (int): how many seconds of history to keep in the store.
+        budget (int): how many requests backfilling may use per period.
+        list_interval (int): how often to list the checks again.
+    """
+
+    backend = attr.ib()
+    interval = attr.ib(default=300, convert=int)
+    history = attr.ib(default=30 * 24 * 60 * 60, convert=int)
+    budget = attr.ib(default=100, convert=int)
+    list_interval = attr.ib(default=3600, convert=int)
+    clock = attr.ib(default=time.time, repr=False)
+    sleep = attr.ib(default=time.sleep, repr=False)
+    _checks = attr.ib(init=False, default=None, repr=False)
+    _listed = attr.ib(init=False, default=None, repr=False)
+    _due = attr.ib(init=False, default=attr.Factory(dict), repr=False)
+    _spent = attr.ib(init=False, default=attr.Factory(deque), repr=False)
+    _turn = attr.ib(init=False, default=0, repr=False)
+
+    def checks(self, now):
+        """Return the checks to sync, listing them again when stale.
+
+        New checks are scheduled to be polled spread over the interval.
+        """
+        if self._checks is None or self._listed + self.list_interval <= now:
+            self._checks = list(self.backend.select_checks())
+            self._listed = now
+            new = [c for c in self._checks if c.id not in self._due]
+            for n, check in enumerate(new):
+                self._due[check.id] = now + n * self.interval // len(new)
+            log.info("syncing %s checks", len(self._checks))
+        return self._checks
+
+    def poll_interval(self, check):
+        """Return how often to poll a check, in seconds."""
+        return max(self.interval, check_resolution(check))
+
+    def poll(self, check, now):
+        """Fetch the results of a check since its stored coverage ends.
+
+        The polled window ends at ``now``, so its pages are never fetched
+        again and are not kept in the backend page cache.
+        """
+        ranges = self.backend.coverage(check).ranges
+        oldest = now - self.history
+        if ranges:
+            start = max(ranges[-1][1], oldest)
+        else:
+            start = max(now - self.poll_interval(check) - SETTLE_TIME, oldest)
+        polled = self.backend.store_checks([check], start, now, cache=None)
+        for _, fetched in polled:
+            log.debug("polled %s results of check %s", fetched, check.id)
+
+    def spent(self, now):
+        """Return the requests spent on backfilling in the last period."""
+        while self._spent and self._spent[0][0] <= now - BUDGET_PERIOD:
+            self._spent.popleft()
+        return sum(n for _, n in self._spent)
+
+    def gap(self, check, now):
+        """Return the newest window of history a check is missing, or None.
+
+        Only the gaps that ended before the next poll and
+        :data:`~uptime_report.backends.pingdom.SETTLE_TIME` are considered,
+        since the rest is fetched by polling.
+        """
+        finish = now - self.poll_interval(check) - SETTLE_TIME
+        gaps = self.backend.coverage(check).gaps(now - self.history, finish)
+        if not gaps:
+            return None
+        start, finish = gaps[0]
+        return max(start, finish - window_size(check)), finish
+
+    def next_gap(self, now):
+        """Return the next check to backfill and its window, round robin.
+
+        Returns:
+            tuple: a check and a window, or None if nothing is missing.
+        """
+        checks = self._checks or []
+        for n in range(len(checks)):
+            check = checks[(self._turn + n) % len(checks)]
+            window = self.gap(check, now)
+            if window is not None:
+                self._turn = (self._turn + n + 1) % len(checks)
+                return check, window
+        return None
+
+    def backfill(self, until):
+        """Fill gaps in the history of checks until ``until`` or done.
+
+        Returns:
+            int: how many windows were fetched.
+        """
+        windows = 0
+        last = None
+        while self.clock() < until:
+            now = self.clock()
+            if self.spent(now) >= self.budget:
+                log.debug("backfill budget of %s requests spent", self.budget)
+                break
+            work = self.next_gap(now)
+            if work is None:
+                break
+            if work == last:
+                log.warning("check %s window %s was not stored",
+                            work[0].id, work[1])
+                break
+            check, window = last = work
+            requests = self.backend.requests
+            list(self.backend.store_checks([check], *window))
+            self._spent.append((now, self.backend.requests - requests))
+            log.debug("backfilled check %s window %s", check.id, window)
+            windows += 1
+        return windows
+
+    def run_once(self):
+        """Poll the checks that are due and backfill until the next one.
+
+        Errors are logged and the check is polled again after its interval.
+
+        Returns:
+            float: how many seconds until a check is due.
+        """
+        now = self.clock()
+        checks = self.checks(now)
+        for check in checks:
+            if self._due[check.id] > now:
+                continue
+            try:
+                self.poll(check, now)
+            except Exception:
+                log.exception("polling check %s failed", check.id)
+            self._due[check.id] = now + self.poll_interval(check)
+        due = min([self._due[c.id] for c in checks] or [now + self.interval])
+        try:
+            self.backfill(due)
+        except Exception:
+            log.exception("backfilling failed")
+        return max(due - self.clock(), 0)
+
+    def run(self, cycles=None):
+        """Sync forever, or for a number of cycles."""
+        while cycles is None or cycles > 0:
+            self.sleep(self.run_once())
+            if cycles is not None:
+                cycles -= 1
@@ -3,22 +3,86 @@
 
 This module contains generic code for processing outages.
 """
+import heapq
 import logging
+import numbers
 from itertools import chain
-from operator import attrgetter
 
 import arrow
 import attr
-from attr.converters import optional
+from uptime_report.backend_utils import iter_async
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 log = logging.getLogger(__name__)
 """Outage module logger."""
 
+OPEN_START = -2 ** 63
+"""int: the start timestamp of ranges that have no start."""
+
+OPEN_FINISH = 2 ** 63 - 1
+"""int: the finish timestamp of ranges that have no finish."""
+
+
+def epoch(value):
+    """Convert a time to an integer timestamp.
+
+    Example:
+
+        >>> epoch(arrow.get(1500000000)), epoch(1500000000.5), epoch(None)
+        (1500000000, 1500000000, None)
+
+    Args:
+        value: a timestamp, an :class:`~arrow.arrow.Arrow` object, anything
+            :func:`arrow.get` parses, or None.
+
+    Returns:
+        int: the timestamp, or None if the value is None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, numbers.Real):
+        return int(value)
+    if not isinstance(value, arrow.Arrow):
+        value = arrow.get(value)
+    return value.timestamp
+
+
+class TimeView(object):
+    """A property viewing an integer timestamp attribute.
+
+    The timestamp is returned as an :class:`~arrow.arrow.Arrow` object,
+    created on access, or as is if ``arrow`` is False. Any time accepted
+    by :func:`epoch` can be assigned.
+    """
+
+    def __init__(self, name, arrow=True):
+        self.name = name
+        self.arrow = arrow
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.name)
+        if value is None or not self.arrow:
+            return value
+        return arrow.get(value)
+
+    def __set__(self, obj, value):
+        setattr(obj, self.name, epoch(value))
+
 
 @attr.s
 class Outage(object):
     """An outage.
 
+    Times are kept as integer timestamps, which the ``*_epoch`` attributes
+    return. The time attributes return :class:`~arrow.arrow.Arrow` objects
+    created on access, for formatting.
+
     Attributes:
         start (:class:`~arrow.arrow.Arrow`): the start time of the
             outage period.
@@ -29,21 +93,34 @@ class Outage(object):
         after (:class:`~arrow.arrow.Arrow`, optional): next time check was ok,
             if available.
         meta: (dict, optinal): arbitrary metadata about this outage.
+        start_epoch (int): the start timestamp, or None.
+        finish_epoch (int): the finish timestamp, or None.
+        before_epoch (int): the timestamp of ``before``, or None.
+        after_epoch (int): the timestamp of ``after``, or None.
 
     """
 
-    start = attr.ib(convert=optional(arrow.get))
-    finish = attr.ib(convert=optional(arrow.get))
-    before = attr.ib(convert=optional(arrow.get), default=None)
-    after = attr.ib(convert=optional(arrow.get), default=None)
+    _start = attr.ib(convert=epoch)
+    _finish = attr.ib(convert=epoch)
+    _before = attr.ib(convert=epoch, default=None)
+    _after = attr.ib(convert=epoch, default=None)
     meta = attr.ib(default=attr.Factory(dict))
 
+    start = TimeView('_start')
+    finish = TimeView('_finish')
+    before = TimeView('_before')
+    after = TimeView('_after')
+    start_epoch = TimeView('_start', arrow=False)
+    finish_epoch = TimeView('_finish', arrow=False)
+    before_epoch = TimeView('_before', arrow=False)
+    after_epoch = TimeView('_after', arrow=False)
+
     def for_json(self):
         """Return a representation of this object as a dict.
 
         Example:
 
-            >>> t = arrow.utcnow()
+            >>> t = arrow.utcnow().replace(microsecond=0)
             >>> Outage(t, t).for_json() == {
             ...    "start": t,
             ...    "finish": t,
@@ -54,9 +131,9 @@ class Outage(object):
             True
 
         Returns:
-            list: a list of names as (:class:`str`) instances.
+            dict: the value of each field, see :meth:`fields`.
         """
-        return attr.asdict(self)
+        return {name: getattr(self, name) for name in self.fields()}
 
     @property
     def humanized_duration(self):
@@ -81,68 +158,187 @@ class Outage(object):
         Returns:
             list: a list of names as (:class:`str`) instances.
         """
-        return list(map(attrgetter('name'), attr.fields(cls)))
+        return [a.name.lstrip('_') for a in attr.fields(cls)]
 
 
-def beginning_of_time():
-    return arrow.get(0).replace(microsecond=0).timestamp
+@attr.s
+class OutageStreams(object):
+    """The outages of several sources, such as checks.
+
+    Iterating yields the outages of each stream in turn. Since each stream
+    is sorted by start, :func:`merge_outages` merges them with a heap
+    instead of sorting all outages, see :func:`merge_sorted_outages`.
 
+    Attributes:
+        streams (iterable): iterables of outages sorted by
+            :func:`start_timestamp`.
+    """
 
-def end_of_time():
-    return arrow.utcnow().replace(years=2**10, microsecond=0).timestamp
+    streams = attr.ib()
 
+    def __iter__(self):
+        return chain.from_iterable(self.streams)
 
-def sort_range(value):
-    """Handle None values as very far in the past or future."""
-    if value[0]:
-        return value[0]  # value as-is
-    if value[1] > 0:     # open beginning
-        return beginning_of_time()
-    return end_of_time()  # open ending
+
+def start_timestamp(outage):
+    """Return the start timestamp of an outage, or :data:`OPEN_START`."""
+    start = outage.start_epoch
+    return OPEN_START if start is None else start
+
+
+def union_ranges(starts, finishes):
+    """Merge the ranges that overlap or touch.
+
+    With :mod:`numpy` installed, ranges are sorted with a single argsort
+    and split where a start is past the running maximum of the finishes
+    before it.
+
+    Example:
+
+        >>> union_ranges([5, 1, 12, 20], [8, 6, 20, OPEN_FINISH])
+        [(1, 8, [1, 0]), (12, 9223372036854775807, [2, 3])]
+
+    Args:
+        starts (sequence): the start timestamp of each range, or
+            :data:`OPEN_START`.
+        finishes (sequence): the finish timestamp of each range, or
+            :data:`OPEN_FINISH`.
+
+    Returns:
+        list: ``(start, finish, members)`` tuples ordered by start, where
+        ``members`` are the indexes of the merged ranges.
+    """
+    if not len(starts):
+        return []
+    if numpy is not None:
+        return _union_arrays(starts, finishes)
+    ranges = []
+    for n in sorted(range(len(starts)), key=starts.__getitem__):
+        if ranges and starts[n] <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], finishes[n])
+            ranges[-1][2].append(n)
+        else:
+            ranges.append([starts[n], finishes[n], [n]])
+    return [tuple(r) for r in ranges]
+
+
+def _union_arrays(starts, finishes):
+    starts = numpy.asarray(starts, dtype=numpy.int64)
+    finishes = numpy.asarray(finishes, dtype=numpy.int64)
+    order = numpy.argsort(starts, kind='mergesort')
+    starts, finishes = starts[order], finishes[order]
+    reach = numpy.maximum.accumulate(finishes)
+    first = numpy.flatnonzero(numpy.concatenate(
+        ([True], starts[1:] > reach[:-1])))
+    last = numpy.concatenate((first[1:], [len(starts)])) - 1
+    return list(zip(starts[first].tolist(), reach[last].tolist(),
+                    [m.tolist() for m in numpy.split(order, first[1:])]))
 
 
 def make_ranges(outages, overlap):
-    """Combine outages to create new ranges."""
-
-    def change(outage):
-        start = outage.start.timestamp if outage.start else None
-        finish = outage.finish.timestamp + overlap if outage.finish else None
-        return ((start, 1, outage), (finish, -1, None))
-
-    # flatten the outages into a list of open or close changes
-    flat = chain.from_iterable(change(o) for o in outages)
-
-    # sort the changes based on time
-    changes = sorted(flat, key=sort_range)
-
-    start = None               # placeholder
-    n = 0                      # the number of range openings
-    for t, state, outage in changes:
-        if t and state < 0:    # range close, correct overlap
-            t -= overlap
-        if n == 0:             # new range starting
-            start = t
-            outages = []
-        n += state             # count open ranges
-        if outage:
-            outages.append(outage)
-        if n == 0:             # all ranges closed
-            yield start, t, outages
+    """Combine outages to create new ranges.
+
+    Outages less than ``overlap`` seconds apart are combined, see
+    :func:`union_ranges`.
+
+    Yields:
+        tuple: the start and finish timestamps of each range, None if it
+        is open, and the outages in it.
+    """
+    outages = list(outages)
+    starts = [start_timestamp(o) for o in outages]
+    finishes = [OPEN_FINISH if o.finish_epoch is None
+                else o.finish_epoch + overlap for o in outages]
+    for start, finish, members in union_ranges(starts, finishes):
+        yield (None if start == OPEN_START else start,
+               None if finish == OPEN_FINISH else finish - overlap,
+               [outages[n] for n in members])
+
+
+def outage_groups(outages):
+    """Return the combined groups of outages."""
+    return set([group
+                for outage in outages
+                for group in outage.meta.get('groups', [])])
+
+
+def merged_outage(start, finish, groups):
+    """Return an outage spanning a range with the combined groups."""
+    meta = {}
+    if groups:
+        meta = {'groups': groups}
+    return Outage(start=start, finish=finish, meta=meta)
+
+
+def merge_sorted_outages(streams, overlap=0):
+    """Merge streams of outages that are each sorted by start.
+
+    The streams are merged with a heap, which takes O(n log k) time for
+    n outages in k streams instead of sorting them all. Every stream is
+    started before the first outage is yielded, so memory use is bounded
+    by what the streams themselves hold: if they are lists, all outages
+    are in memory at once. Outages are merged like :func:`merge_outages`.
+
+    Example:
+
+        >>> streams = [[Outage(1, 3), Outage(8, 9)], [Outage(2, 5)]]
+        >>> [(o.start.timestamp, o.finish.timestamp)
+        ...  for o in merge_sorted_outages(streams)]
+        [(1, 5), (8, 9)]
+
+    Args:
+        streams (iterable): iterables of outages sorted by
+            :func:`start_timestamp`.
+        overlap (int, optional): how many seconds apart outages may be to
+            be merged.
+
+    Yields:
+        Outage: the merged outages, ordered by start.
+    """
+    keyed = [_keyed_stream(n, stream) for n, stream in enumerate(streams)]
+    current = None  # the start, finish and groups of the open range
+    for (start, _, _), outage in heapq.merge(*keyed):
+        finish = (OPEN_FINISH if outage.finish_epoch is None
+                  else outage.finish_epoch + overlap)
+        if current and start <= current[1]:
+            current[1] = max(current[1], finish)
+        else:
+            if current:
+                yield _close_range(current, overlap)
+            current = [start, finish, set()]
+        current[2].update(outage_groups([outage]))
+    if current:
+        yield _close_range(current, overlap)
+
+
+def _keyed_stream(n, stream):
+    """Key the outages of stream ``n`` by start, stream and position."""
+    for i, o in enumerate(stream):
+        yield (start_timestamp(o), n, i), o
+
+
+def _close_range(current, overlap):
+    start, finish, groups = current
+    return merged_outage(
+        None if start == OPEN_START else start,
+        None if finish == OPEN_FINISH else finish - overlap,
+        groups)
 
 
 def merge_outages(outages, overlap=0):
-    """Merge a list of Outage objects."""
+    """Merge a list of Outage objects.
+
+    :class:`OutageStreams` are merged with :func:`merge_sorted_outages`,
+    other outages with :func:`make_ranges`.
+    """
+    if isinstance(outages, OutageStreams):
+        for outage in merge_sorted_outages(outages.streams, overlap):
+            yield outage
+        return
 
     # make new outage objects from new ranges
     for start, finish, data in make_ranges(outages, overlap):
-        # combine groups
-        groups = set([group
-                      for outage in data
-                      for group in outage.meta.get('groups', [])])
-        meta = {}
-        if groups:
-            meta = {'groups': groups}
-        yield Outage(start=start, finish=finish, meta=meta)
+        yield merged_outage(start, finish, outage_groups(data))
 
 
 def filter_outage_len(outages, minlen=0):
@@ -155,42 +351,43 @@ def filter_outage_len(outages, minlen=0):
 
     Yields:
         Outage: the next outage from the list that has the minimum duration.
+        Outages without a start or finish are kept.
 
     Example:
 
         >>> outages = [Outage(start=1, finish=5), Outage(start=2, finish=3)]
-        >>> [o.start.timestamp for o in filter_outage_len(outages, minlen=2)]
+        >>> [o.start_epoch for o in filter_outage_len(outages, minlen=2)]
         [1]
 
     """
 
     for o in outages:
-        if (o.finish - o.start).seconds >= minlen:
+        start, finish = o.start_epoch, o.finish_epoch
+        if start is None or finish is None or finish - start >= minlen:
             yield o
 
 
 def get_outages(backend, overlap=0, minlen=0, **kwargs):
+    outages = backend.get_outages(**kwargs)
+    if hasattr(outages, '__aiter__'):  # asynchronous backend
+        outages = iter_async(outages)
     return filter_outage_len(
-        merge_outages(backend.get_outages(**kwargs), overlap=overlap),
+        merge_outages(outages, overlap=overlap),
         minlen=minlen)
 
 
 def get_downtime_in_seconds(outages, start=None, finish=None):
     duration = 0
     for o in outages:
-        a, b = (o.start, o.finish)
-        if a:
-            a = a.timestamp
-        else:
+        a, b = (o.start_epoch, o.finish_epoch)
+        if a is None:
             msg = 'an outage began before the filtered period'
             if start is not None:
                 a = start
                 log.warning(msg)
             else:
                 raise ValueError(msg + ' but no start time was specified.')
-        if b:
-            b = b.timestamp
-        else:
+        if b is None:
             msg = 'an outage ended after the filtered period'
             if finish is not None:
                 b = finish
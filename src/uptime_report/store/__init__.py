@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Local result stores.
+
+A store keeps the results of each check along with the time ranges that
+have already been fetched, so that only the gaps need to be requested
+from a backend. Results are kept as rows of
+``(time, status, probeid, desc)`` tuples, where ``status`` is a
+:class:`~uptime_report.backends.pingdom.ResultType` value.
+
+Each store type is implemented in a module of this package with a
+``Store`` attribute, see :func:`open_store`.
+"""
+import importlib
+import logging
+from os.path import expanduser
+
+import attr
+
+log = logging.getLogger(__name__)
+"""store module logger."""
+
+DEFAULT_STORE = 'json'
+"""str: name of the default store module."""
+
+
+@attr.s
+class Coverage(object):
+    """A set of time ranges.
+
+    Ranges are ``[start, finish]`` lists of timestamps, kept sorted and
+    disjoint. Ranges that overlap or touch are merged.
+
+    Example:
+
+        >>> c = Coverage()
+        >>> c.add(10, 20)
+        >>> c.add(30, 40)
+        >>> c.add(20, 25)
+        >>> c.ranges
+        [[10, 25], [30, 40]]
+        >>> c.gaps(0, 50)
+        [(40, 50), (25, 30), (0, 10)]
+        >>> c.gaps(12, 22)
+        []
+
+    Attributes:
+        ranges (list): the covered ranges, oldest first.
+    """
+
+    ranges = attr.ib(default=attr.Factory(list))
+
+    def add(self, start, finish):
+        """Add the range from ``start`` to ``finish`` to the set."""
+        if finish <= start:
+            return
+        ranges = []
+        for s, f in self.ranges:
+            if f < start or s > finish:
+                ranges.append([s, f])
+            else:
+                start, finish = min(s, start), max(f, finish)
+        ranges.append([start, finish])
+        self.ranges = sorted(ranges)
+
+    def gaps(self, start, finish):
+        """Return the parts of a range that are not covered, newest first.
+
+        Args:
+            start (int): the start timestamp of the range.
+            finish (int): the finish timestamp of the range.
+
+        Returns:
+            list: a list of ``(start, finish)`` tuples.
+        """
+        gaps = []
+        for s, f in self.ranges:
+            if f <= start:
+                continue
+            if s >= finish:
+                break
+            if s > start:
+                gaps.append((start, s))
+            start = f
+        if start < finish:
+            gaps.append((start, finish))
+        return gaps[::-1]
+
+
+def open_store(path, kind=DEFAULT_STORE):
+    """Open a local result store.
+
+    Args:
+        path (str): where the store keeps its data.
+        kind (str, optional): the name of the store module, ``json``,
+            ``sqlite`` or ``archive``. Defaults to ``'json'``.
+
+    Raises:
+        ValueError: if there is no such store.
+    """
+    try:
+        mod = importlib.import_module('.' + kind, __name__)
+        store = mod.Store
+    except (ImportError, AttributeError):
+        raise ValueError("Unknown result store: {}".format(kind))
+    log.debug("opening %s store at %s", kind, path)
+    return store(expanduser(path))
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""A columnar result archive kept in memory-mapped files.
+
+Each check has a directory in the archive holding its results as parallel
+fixed-width columns, sorted by time:
+
+* ``time``: int64 timestamps,
+* ``status``: uint8 codes, indexes of :data:`STATUSES`,
+* ``probe``: uint32 probe IDs, 0 if unknown.
+
+A ``columns.json`` manifest holds the generation and row count of the
+columns. Merges write a new generation of column files and switch to it by
+replacing the manifest, and rows an interrupted append left beyond the row
+count are truncated, so the columns always line up.
+
+A sparse ``index`` column holds every :data:`INDEX_STRIDE`-th timestamp so
+that a time window is found by touching a handful of pages. Columns are
+read through :mod:`mmap`, so :meth:`ArchiveStore.columns` returns slices of
+them without copying. Result descriptions are not archived.
+
+This store requires Python 3.
+"""
+from __future__ import absolute_import
+
+import json
+import logging
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+import attr
+from uptime_report.store import Coverage
+
+log = logging.getLogger(__name__)
+
+STATUSES = ('up', 'down', 'unconfirmed', 'unknown')
+"""tuple: the result statuses, indexed by their code."""
+
+COLUMNS = (('time', 'q'), ('status', 'B'), ('probe', 'I'))
+"""tuple: the name and :mod:`array` type code of each column."""
+
+INDEX_STRIDE = 1024
+"""int: how many rows each entry of the time index spans."""
+
+
+@attr.s(frozen=True)
+class Columns(object):
+    """The columns of a check's archived results, oldest first.
+
+    Attributes:
+        time (memoryview): int64 timestamps.
+        status (memoryview): uint8 codes of :data:`STATUSES`.
+        probe (memoryview): uint32 probe IDs.
+    """
+
+    time = attr.ib()
+    status = attr.ib()
+    probe = attr.ib()
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        return Columns(self.time[key], self.status[key], self.probe[key])
+
+
+def _column(path, typecode):
+    """Return a read-only view of a column file."""
+    try:
+        with open(path, 'rb') as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):  # missing or empty
+        return memoryview(array(typecode).tobytes()).cast(typecode)
+    return memoryview(mm).cast(typecode)
+
+
+def _find(index, times, value, bisect):
+    """Find a timestamp using the sparse index, like ``bisect(times)``."""
+    block = bisect(index, value)
+    lo = max(block - 1, 0) * INDEX_STRIDE
+    hi = min(block * INDEX_STRIDE, len(times))
+    return bisect(times, value, lo, hi)
+
+
+@attr.s
+class ArchiveStore(object):
+    """A directory of column files, one directory per check.
+
+    Attributes:
+        path (str): the archive directory.
+    """
+
+    path = attr.ib()
+    _views = attr.ib(init=False, repr=False, default=attr.Factory(dict))
+    _lock = attr.ib(init=False, repr=False,
+                    default=attr.Factory(threading.RLock))
+
+    def _file(self, check_id, name, generation=0):
+        if generation:
+            name = '{}.{}'.format(name, generation)
+        return os.path.join(self.path, str(check_id), name)
+
+    def _manifest(self, check_id):
+        """Return the generation and row count of a check's columns.
+
+        The manifest commits each write of the columns. Archives written
+        before it existed have generation 0 and no row count.
+        """
+        try:
+            with open(self._file(check_id, 'columns.json')) as fp:
+                manifest = json.load(fp)
+        except (IOError, ValueError):
+            return 0, None
+        return manifest['generation'], manifest['rows']
+
+    def _load(self, check_id):
+        if check_id not in self._views:
+            generation, count = self._manifest(check_id)
+            self._repair(check_id, generation, count)
+            columns = Columns(*(
+                _column(self._file(check_id, name, generation), code)
+                for name, code in COLUMNS))
+            index = _column(self._file(check_id, 'index'), 'q')
+            if len(index) != -(-len(columns) // INDEX_STRIDE):
+                self._write(check_id, 'index', array(
+                    'q', columns.time[::INDEX_STRIDE]).tobytes())
+                index = _column(self._file(check_id, 'index'), 'q')
+            self._views[check_id] = (columns, index, generation)
+        return self._views[check_id]
+
+    def _repair(self, check_id, generation, count):
+        """Truncate rows an interrupted append left beyond the manifest.
+
+        Without a row count, columns are truncated to the shortest one.
+        """
+        sizes = []
+        for name, code in COLUMNS:
+            path = self._file(check_id, name, generation)
+            width = array(code).itemsize
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            sizes.append((path, size, width))
+        if count is None:
+            count = min(size // width for _, size, width in sizes)
+        for path, size, width in sizes:
+            if size > count * width:
+                log.warning("truncating %s to %s rows", path, count)
+                os.truncate(path, count * width)
+            elif size < count * width:
+                raise ValueError("{} has {} rows, expected {}".format(
+                    path, size // width, count))
+
+    def _write(self, check_id, name, data, append=False, generation=0):
+        path = self._file(check_id, name, generation)
+        if append:
+            with open(path, 'ab') as fp:
+                fp.write(data)
+            return
+        with open(path + '.tmp', 'wb') as fp:
+            fp.write(data)
+        os.rename(path + '.tmp', path)
+
+    def _remove_stale(self, check_id, generation):
+        """Remove the column files of generations other than the current
+        one, left by replaced or interrupted merges."""
+        current = set(os.path.basename(self._file(check_id, name, generation))
+                      for name, _ in COLUMNS)
+        names = set(name for name, _ in COLUMNS)
+        directory = os.path.join(self.path, str(check_id))
+        for filename in os.listdir(directory):
+            if filename.split('.')[0] in names and filename not in current:
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError:
+                    pass
+
+    def coverage(self, check_id):
+        """Return the :class:`~uptime_report.store.Coverage` of a check."""
+        try:
+            with open(self._file(check_id, 'coverage.json')) as fp:
+                return Coverage(json.load(fp))
+        except (IOError, ValueError):
+            return Coverage()
+
+    def add(self, check_id, start, finish, rows):
+        """Add the results of a check and mark a range as covered.
+
+        Rows newer than every archived row are appended to the columns.
+        Otherwise only the archived rows within the time span of the new
+        rows are merged with them, and the columns are rewritten around
+        them as slices. Rows replace any archived rows with the same time.
+        """
+        rows = sorted(dict((row[0], row) for row in rows).values(),
+                      key=itemgetter(0))
+        with self._lock:
+            directory = os.path.join(self.path, str(check_id))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            columns, _, generation = self._load(check_id)
+            append = (not rows or not len(columns) or
+                      rows[0][0] > columns.time[-1])
+            lo = hi = len(columns)
+            if not append:
+                lo = bisect_left(columns.time, rows[0][0])
+                hi = bisect_right(columns.time, rows[-1][0])
+                merged = {t: (t, STATUSES[s], p, None) for t, s, p in zip(
+                    columns.time[lo:hi], columns.status[lo:hi],
+                    columns.probe[lo:hi])}
+                merged.update((row[0], row) for row in rows)
+                rows = sorted(merged.values(), key=itemgetter(0))
+            count = len(columns) + len(rows) - (hi - lo)
+            target = generation if append else generation + 1
+            for (name, code), column, values in zip(COLUMNS, (
+                    columns.time, columns.status, columns.probe), (
+                    (r[0] for r in rows),
+                    (STATUSES.index(r[1]) for r in rows),
+                    (r[2] or 0 for r in rows))):
+                data = array(code, values).tobytes()
+                if not append:
+                    data = b''.join((column[:lo].tobytes(), data,
+                                     column[hi:].tobytes()))
+                self._write(check_id, name, data, append, target)
+            # the columns are switched to atomically by the manifest
+            self._write(check_id, 'columns.json', json.dumps(
+                {'generation': target, 'rows': count}).encode('utf-8'))
+            self._views.pop(check_id, None)
+            if target != generation:
+                self._remove_stale(check_id, target)
+            columns, _, _ = self._load(check_id)
+            self._write(check_id, 'index',
+                        array('q', columns.time[::INDEX_STRIDE]).tobytes())
+            if finish > start:
+                coverage = self.coverage(check_id)
+                coverage.add(start, finish)
+                self._write(check_id, 'coverage.json',
+                            json.dumps(coverage.ranges).encode('utf-8'))
+            self._views.pop(check_id, None)
+
+    def columns(self, check_id, start, finish):
+        """Return the archived columns of a check in a range, oldest first.
+
+        The columns are views of the archive files and are not copied.
+
+        Args:
+            check_id: the check ID.
+            start (int): the start timestamp, inclusive.
+            finish (int): the finish timestamp, inclusive.
+
+        Returns:
+            Columns: the columns of the results in the range.
+        """
+        with self._lock:
+            columns, index, _ = self._load(check_id)
+        lo = _find(index, columns.time, start, bisect_left)
+        hi = _find(index, columns.time, finish, bisect_right)
+        return columns[lo:hi]
+
+    def results(self, check_id, start, finish, status=None):
+        """Return the archived rows of a check in a range, newest first.
+
+        See :meth:`uptime_report.store.json.JSONStore.results`.
+        """
+        columns = self.columns(check_id, start, finish)
+        codes = None
+        if status is not None:
+            codes = set(STATUSES.index(s) for s in status)
+        return [
+            (t, STATUSES[s], p or None, None)
+            for t, s, p in zip(columns.time[::-1], columns.status[::-1],
+                               columns.probe[::-1])
+            if codes is None or s in codes]
+
+    def close(self):
+        with self._lock:
+            self._views.clear()
+
+
+Store = ArchiveStore
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""A result store kept in JSON files.
+
+Each check has a file in the store directory holding its coverage and its
+results. Files are loaded on first use and rewritten whenever results are
+added.
+"""
+from __future__ import absolute_import
+
+import json
+import os
+import threading
+
+import attr
+from uptime_report.store import Coverage
+
+
+@attr.s
+class JSONStore(object):
+    """A directory of JSON files, one per check.
+
+    Attributes:
+        path (str): the store directory.
+    """
+
+    path = attr.ib()
+    _checks = attr.ib(init=False, repr=False, default=attr.Factory(dict))
+    _lock = attr.ib(init=False, repr=False,
+                    default=attr.Factory(threading.RLock))
+
+    def _file(self, check_id):
+        return os.path.join(self.path, '{}.json'.format(check_id))
+
+    def _load(self, check_id):
+        if check_id not in self._checks:
+            try:
+                with open(self._file(check_id)) as fp:
+                    data = json.load(fp)
+            except (IOError, ValueError):
+                data = {'coverage': [], 'results': []}
+            self._checks[check_id] = (
+                Coverage(data['coverage']),
+                {row[0]: tuple(row) for row in data['results']})
+        return self._checks[check_id]
+
+    def _save(self, check_id):
+        coverage, rows = self._checks[check_id]
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        path = self._file(check_id)
+        with open(path + '.tmp', 'w') as fp:
+            json.dump({'coverage': coverage.ranges,
+                       'results': sorted(rows.values(), reverse=True)}, fp)
+        os.rename(path + '.tmp', path)
+
+    def coverage(self, check_id):
+        """Return the :class:`~uptime_report.store.Coverage` of a check."""
+        with self._lock:
+            return Coverage(list(self._load(check_id)[0].ranges))
+
+    def add(self, check_id, start, finish, rows):
+        """Add the results of a check and mark a range as covered.
+
+        Rows replace any stored rows with the same time. The range from
+        ``start`` to ``finish`` is only marked as covered if it is not
+        empty.
+        """
+        with self._lock:
+            coverage, stored = self._load(check_id)
+            stored.update((row[0], tuple(row)) for row in rows)
+            coverage.add(start, finish)
+            self._save(check_id)
+
+    def results(self, check_id, start, finish, status=None):
+        """Return the stored rows of a check in a range, newest first.
+
+        Args:
+            check_id: the check ID.
+            start (int): the start timestamp, inclusive.
+            finish (int): the finish timestamp, inclusive.
+            status (list, optional): the statuses of the rows to return.
+        """
+        with self._lock:
+            rows = self._load(check_id)[1]
+            return sorted((
+                row for row in rows.values()
+                if start <= row[0] <= finish and
+                (status is None or row[1] in status)), reverse=True)
+
+    def close(self):
+        with self._lock:
+            self._checks.clear()
+
+
+Store = JSONStore
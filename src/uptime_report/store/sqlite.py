@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""A result store kept in an SQLite database.
+
+Results are kept in a table keyed on ``(check_id, time)`` so queries for a
+timeframe are range scans over that index. The database uses write-ahead
+logging, which lets several processes read while one of them writes.
+"""
+from __future__ import absolute_import
+
+import os
+import sqlite3
+import threading
+from itertools import islice
+
+import attr
+from uptime_report.store import Coverage
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS results (
+        check_id INTEGER NOT NULL,
+        time INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        probeid INTEGER,
+        description TEXT,
+        PRIMARY KEY (check_id, time))""",
+    """CREATE TABLE IF NOT EXISTS coverage (
+        check_id INTEGER NOT NULL,
+        start INTEGER NOT NULL,
+        finish INTEGER NOT NULL)""",
+    """CREATE INDEX IF NOT EXISTS coverage_check ON coverage (check_id)""",
+)
+"""tuple: the statements that create the store tables."""
+
+BATCH_SIZE = 1000
+"""int: how many rows to insert per statement."""
+
+
+@attr.s
+class SQLiteStore(object):
+    """An SQLite database file.
+
+    Each thread uses its own connection to the database.
+
+    Attributes:
+        path (str): the database file.
+        timeout (float): how many seconds to wait for a lock held by
+            another connection.
+    """
+
+    path = attr.ib()
+    timeout = attr.ib(default=30.0)
+    _local = attr.ib(init=False, repr=False,
+                     default=attr.Factory(threading.local))
+
+    @property
+    def db(self):
+        """The database connection of the current thread."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            with db:
+                for statement in SCHEMA:
+                    db.execute(statement)
+            self._local.db = db
+        return db
+
+    def coverage(self, check_id):
+        """Return the :class:`~uptime_report.store.Coverage` of a check."""
+        return Coverage([list(r) for r in self.db.execute(
+            'SELECT start, finish FROM coverage WHERE check_id = ? '
+            'ORDER BY start', (check_id,))])
+
+    def add(self, check_id, start, finish, rows):
+        """Add the results of a check and mark a range as covered.
+
+        Rows are inserted in batches of :data:`BATCH_SIZE` and replace any
+        stored rows with the same time, in a single transaction.
+        """
+        db = self.db
+        rows = ((check_id,) + tuple(row) for row in rows)
+        with db:
+            while True:
+                batch = list(islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+                db.executemany(
+                    'INSERT OR REPLACE INTO results '
+                    '(check_id, time, status, probeid, description) '
+                    'VALUES (?, ?, ?, ?, ?)', batch)
+            if finish > start:
+                coverage = self.coverage(check_id)
+                coverage.add(start, finish)
+                db.execute('DELETE FROM coverage WHERE check_id = ?',
+                           (check_id,))
+                db.executemany(
+                    'INSERT INTO coverage (check_id, start, finish) '
+                    'VALUES (?, ?, ?)',
+                    [(check_id, s, f) for s, f in coverage.ranges])
+
+    def results(self, check_id, start, finish, status=None):
+        """Return the stored rows of a check in a range, newest first.
+
+        See :meth:`uptime_report.store.json.JSONStore.results`.
+        """
+        query = ('SELECT time, status, probeid, description FROM results '
+                 'WHERE check_id = ? AND time BETWEEN ? AND ?')
+        params = [check_id, start, finish]
+        if status is not None:
+            query += ' AND status IN ({})'.format(
+                ', '.join('?' * len(status)))
+            params.extend(status)
+        return self.db.execute(
+            query + ' ORDER BY time DESC', params).fetchall()
+
+    def compact(self):
+        """Merge the write-ahead log into the database and reclaim space."""
+        db = self.db
+        db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.execute('VACUUM')
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+Store = SQLiteStore
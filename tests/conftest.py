@@ -1,5 +1,11 @@
+import sys
+
 import pytest
 
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_pingdom_async.py')  # async generators
+
 
 @pytest.fixture
 def result_data():
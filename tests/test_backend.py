@@ -3,7 +3,7 @@ from __future__ import unicode_literals
 import py.path
 import pytest
 from configobj import ConfigObj
-from uptime_report import cli
+from uptime_report import backends, cli
 from uptime_report.backends import backend_config, get_backend, list_backends
 
 
@@ -38,6 +38,16 @@ def test_list_backends(mocker):
     cli.list_backends.assert_called_once()
 
 
+def test_load_backends_skips_broken(mocker):
+    """Test backends that fail to import are left out."""
+    good, broken = mocker.Mock(), mocker.Mock()
+    broken.load_module.side_effect = SyntaxError('async def')
+    mocker.patch('uptime_report.backends._find_backends',
+                 return_value=[('good', good), ('broken', broken)])
+    assert backends._load_backends() == {
+        'good': good.load_module.return_value}
+
+
 @pytest.fixture(scope='function')
 def backend(request):
     """Return a backend implementation class for this name."""
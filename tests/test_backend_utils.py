@@ -1,6 +1,13 @@
 from __future__ import unicode_literals
 
-from uptime_report.backend_utils import group_by_range, offset_iter
+import threading
+import time
+
+import pytest
+from uptime_report.backend_utils import (QuotaBucket, SharedQuotaBucket,
+                                         SharedTokenBucket, TokenBucket,
+                                         concurrent_iter, group_by_range,
+                                         offset_iter)
 
 
 def test_offset_iter_none(mocker):
@@ -46,6 +53,46 @@ def test_offset_iter_args(mocker):
     method.assert_called_once_with(123, limit=10, offset=0)
 
 
+def test_offset_iter_prefetch_short(mocker):
+    method = mocker.Mock(return_value=[1, 2])
+    assert list(offset_iter(method, limit=10, prefetch=2)) == [1, 2]
+    method.assert_called_once_with(limit=10, offset=0)
+
+
+def test_offset_iter_prefetch():
+    pages = {o: list(range(o, min(o + 10, 35))) for o in range(0, 100, 10)}
+    calls = []
+    in_flight = []
+    lock = threading.Lock()
+
+    def method(limit, offset, foo):
+        assert (limit, foo) == (10, 'bar')
+        with lock:
+            calls.append(offset)
+            in_flight.append(len(calls) - consumed[0] // 10)
+        time.sleep(0.01 * (offset % 20))  # later pages finish first
+        return iter(pages[offset])
+
+    consumed = [0]
+    results = []
+    for result in offset_iter(method, limit=10, prefetch=2, foo='bar'):
+        results.append(result)
+        consumed[0] = len(results)
+    assert results == list(range(35))
+    assert sorted(calls)[:4] == [0, 10, 20, 30]
+    assert len(calls) <= 6
+    assert max(in_flight) <= 3
+
+
+def test_offset_iter_prefetch_error(mocker):
+    method = mocker.Mock(side_effect=[[1], [2], ValueError(), [3]])
+    it = offset_iter(method, limit=1, prefetch=2)
+    assert next(it) == 1
+    assert next(it) == 2
+    with pytest.raises(ValueError):
+        next(it)
+
+
 def test_group_by_range(result_data, range_data):
     ranges = list(group_by_range(result_data, lambda x: x[1], lambda x: x[0]))
     ranges.sort(key=lambda g: g[1][0][2])
@@ -61,3 +108,89 @@ def test_group_by_range_reversed(result_data, range_data):
          list(reversed(results)),
          start)
         for start, results, end in range_data]
+
+
+def test_concurrent_iter_serial(mocker):
+    method = mocker.Mock(side_effect=lambda i: iter(range(i)))
+    it = concurrent_iter(method, [1, 2], concurrency=1)
+    item, results = next(it)
+    assert item == 1
+    method.assert_called_once_with(1)
+    assert list(results) == [0]
+    assert [(i, list(r)) for i, r in it] == [(2, [0, 1])]
+
+
+def test_concurrent_iter_ordered():
+    threads = set()
+
+    def method(i):
+        threads.add(threading.current_thread())
+        time.sleep(0.01 * (5 - i))  # later items finish first
+        return iter(range(i))
+
+    it = concurrent_iter(method, range(5), concurrency=3)
+    assert list(it) == [(i, list(range(i))) for i in range(5)]
+    assert threading.current_thread() not in threads
+    assert len(threads) <= 3
+
+
+def test_concurrent_iter_error(mocker):
+    method = mocker.Mock(side_effect=[[1], ValueError()])
+    it = concurrent_iter(method, [1, 2], concurrency=2)
+    with pytest.raises(ValueError):
+        list(it)
+
+
+def test_token_bucket(mocker):
+    mocker.patch('uptime_report.backend_utils.time.time', return_value=100)
+    sleep = mocker.patch('uptime_report.backend_utils.time.sleep')
+    bucket = TokenBucket(capacity=2)
+    assert [bucket.acquire() for _ in range(5)] == [0] * 5
+    bucket.update(rate=4)
+    assert bucket.tokens == 2
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.25, 0.5]
+    assert bucket.acquire() == 0.75
+    sleep.assert_called_once_with(0.75)
+    time.time.return_value = 101
+    assert bucket.reserve() == 0
+    assert bucket.tokens == 0
+
+
+def test_shared_token_bucket(tmpdir, mocker):
+    mocker.patch('uptime_report.backend_utils.time.time', return_value=100)
+    path = str(tmpdir.join('bucket'))
+    one = SharedTokenBucket(capacity=1, path=path)
+    two = SharedTokenBucket(capacity=1, path=path)
+    one.update(rate=2)
+    assert two.reserve() == 0
+    assert one.reserve() == 0.5
+    assert two.reserve() == 1
+    time.time.return_value = 101.5
+    assert one.reserve() == 0
+
+
+def test_quota_bucket(mocker):
+    mocker.patch('uptime_report.backend_utils.time.time', return_value=100)
+    bucket = QuotaBucket()
+    assert [bucket.reserve() for _ in range(3)] == [0] * 3
+    bucket.update(remaining=3, reset=50)
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 50, 50]
+    bucket.update(remaining=1, reset=50)  # counted before the reservations
+    assert bucket.remaining == -2
+    time.time.return_value = 150
+    assert bucket.reserve() == 0  # refilled to the limit at the reset
+    assert (bucket.remaining, bucket.reset) == (0, 200)
+    bucket.update(remaining=3, reset=60)  # a new period
+    assert bucket.remaining == 3
+    assert [bucket.reserve() for _ in range(7)] == [0] * 3 + [60] * 3 + [120]
+
+
+def test_shared_quota_bucket(tmpdir, mocker):
+    mocker.patch('uptime_report.backend_utils.time.time', return_value=100)
+    path = str(tmpdir.join('bucket'))
+    one = SharedQuotaBucket(path=path)
+    two = SharedQuotaBucket(path=path)
+    one.update(remaining=2, reset=10)
+    assert two.reserve() == 0
+    assert one.reserve() == 0
+    assert two.reserve() == 10
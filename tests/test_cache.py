@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+import zlib
+
+from uptime_report.cache import MISSING, PageCache
+
+
+def test_page_cache(tmpdir, mocker):
+    time = mocker.patch('uptime_report.cache.time.time', return_value=1000)
+    cache = PageCache(str(tmpdir), ttl=60)
+    key = ('results', 1, 0, 100, [['offset', 0]])
+    assert cache.get(key) is MISSING
+    cache.set(key, [{'time': 1, 'status': 'up'}] * 100, final=True)
+    cache.set(('results', 2), [])
+    assert cache.get(key) == [{'time': 1, 'status': 'up'}] * 100
+    assert cache.get(('results', 2)) == []
+    time.return_value = 1061
+    assert cache.get(('results', 2)) is MISSING
+    assert cache.get(key) == [{'time': 1, 'status': 'up'}] * 100
+    assert (cache.hits, cache.misses) == (3, 2)
+    with open(cache._file(key), 'rb') as fp:
+        data = fp.read()
+    assert len(data) < 100
+    assert zlib.decompress(data).startswith(b'[1000, true, ["results", 1')
+
+
+def test_page_cache_corrupt(tmpdir):
+    cache = PageCache(str(tmpdir))
+    cache.set('key', 1)
+    with open(cache._file('key'), 'wb') as fp:
+        fp.write(b'garbage')
+    assert cache.get('key') is MISSING
+
+
+def test_page_cache_evict(tmpdir, mocker):
+    mocker.patch('uptime_report.cache.time.time', return_value=1000)
+    cache = PageCache(str(tmpdir))
+    for n in range(10):
+        cache.set(n, [n] * 1000, final=True)
+        tmpdir.join(cache._file(n)[len(str(tmpdir)) + 1:]).setmtime(n)
+    size = sum(f.size() for f in tmpdir.visit('*.json.z'))
+    cache.get(0)  # recently used
+    cache.max_bytes = size // 2
+    cache.set(10, [10] * 1000, final=True)
+    kept = [n for n in range(11) if cache.get(n) is not MISSING]
+    assert len(kept) < 10
+    assert kept == [0] + list(range(12 - len(kept), 11))
+    assert sum(f.size() for f in tmpdir.visit('*.json.z')) <= size // 2
+    assert cache.evictions == 11 - len(kept)
+
+
+def test_page_cache_overwrite_size(tmpdir):
+    """Test overwriting a page counts only the change in its size."""
+    cache = PageCache(str(tmpdir), max_bytes=10 ** 6)
+    for n in range(5):
+        cache.set('key', list(range(n * 100)))
+    assert cache._size == sum(f.size() for f in tmpdir.visit('*.json.z'))
+    assert cache.evictions == 0
+
+
+def test_page_cache_compact(tmpdir, mocker):
+    time = mocker.patch('uptime_report.cache.time.time', return_value=1000)
+    cache = PageCache(str(tmpdir), ttl=60)
+    cache.set(['final', 1], 1, final=True)
+    cache.set(['final', 2], 2, final=True)
+    cache.set(['open', 3], 3)
+    tmp = tmpdir.join('00').ensure(dir=True).join('x.tmp')
+    tmp.write('partial')
+    tmp.setmtime(1050)
+    time.return_value = 1061
+    assert cache.compact(lambda key: key[1] == 2) == 2
+    assert cache.compact() == 0
+    time.return_value = 10 ** 6
+    assert cache.compact() == 1
+    assert cache.get(['final', 1]) == 1
+    assert cache.evictions == 3
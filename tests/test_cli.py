@@ -88,8 +88,87 @@ def test_outages(capsys, mocker, ungrouped_outage_data):
     ]
 
 
+def test_offline(mocker, capsys):
+    mocker.patch('uptime_report.cli.read_config')
+    b = mocker.patch('uptime_report.cli.get_backend')
+    impl = b.return_value.from_config.return_value
+    impl.offline = True
+    impl.get_outages.return_value = []
+    cli.uptime(start=1000, finish=2000)
+    impl.require_coverage.assert_called_once_with(1000, 2000)
+    out, _ = capsys.readouterr()
+    assert out == "0\n"
+    impl.require_coverage.side_effect = ValueError('missing windows')
+    with pytest.raises(errors.CliValueError):
+        cli.outages(start=1000, finish=2000, fmt=Format.JSON)
+    impl.get_outages.assert_called_once_with(start=1000, finish=2000)
+
+
+def test_with_backend_overrides(mocker):
+    b = mocker.patch('uptime_report.cli.get_backend')
+
+    @cli.with_backend
+    def doit(backend=None, **kwargs):
+        return backend
+
+    config = {'pingdom': {'username': 'user', 'concurrency': '2'}}
+    assert doit(config=config) == b.return_value.from_config.return_value
+    b.return_value.from_config.assert_called_with(config['pingdom'])
+    doit(config=config, concurrency=8, outage_mode='summary', checks='1,2',
+         cache_dir='/tmp/cache', offline=True, quorum=3)
+    b.return_value.from_config.assert_called_with({
+        'username': 'user', 'concurrency': 8, 'outage_mode': 'summary',
+        'checks': '1,2', 'cache_dir': '/tmp/cache', 'offline': True,
+        'quorum': 3})
+    b.return_value.from_config.side_effect = ValueError('invalid')
+    with pytest.raises(errors.CliValueError):
+        doit(config=config)
+
+
+def test_sync(mocker, capsys):
+    mocker.patch('uptime_report.cli.read_config')
+    b = mocker.patch('uptime_report.cli.get_backend')
+    impl = b.return_value.from_config.return_value
+    impl.sync.return_value = {
+        'checks': 2, 'results': 3000, 'requests': 4, 'seconds': 2.0}
+    cli.sync(start=1000, finish=2000)
+    impl.sync.assert_called_once_with(1000, 2000)
+    out, _ = capsys.readouterr()
+    assert out == ("synced 3000 results of 2 checks in 2.0s: "
+                   "1500.0 results/s, 2.0 requests/s\n")
+    impl.sync.side_effect = ValueError('no store')
+    with pytest.raises(errors.CliValueError):
+        cli.sync(start=1000, finish=2000)
+
+
+def test_compact(mocker):
+    mocker.patch('uptime_report.cli.read_config')
+    b = mocker.patch('uptime_report.cli.get_backend')
+    impl = b.return_value.from_config.return_value
+    cli.compact()
+    impl.compact.assert_called_once_with()
+    del impl.compact
+    with pytest.raises(errors.CliValueError):
+        cli.compact()
+
+
+def test_daemon(mocker):
+    mocker.patch('uptime_report.cli.read_config')
+    b = mocker.patch('uptime_report.cli.get_backend')
+    impl = b.return_value.from_config.return_value
+    impl.configure_mock(sync_interval=60, sync_history=2, sync_budget=10,
+                        check_ttl=600)
+    daemon = mocker.patch('uptime_report.cli.SyncDaemon')
+    cli.daemon()
+    daemon.assert_called_once_with(impl, interval=60, history=172800,
+                                   budget=10, list_interval=600)
+    daemon.return_value.run.assert_called_once_with()
+    impl.store_path = None
+    with pytest.raises(errors.CliValueError):
+        cli.daemon()
+
+
 def test_with_common_args(mocker):
-    mocker.patch('uptime_report.cli.requests_cache')
     mocker.patch('uptime_report.cli.logging')
 
     cli.logging.ERROR = 'errz'
@@ -97,19 +176,13 @@ def test_with_common_args(mocker):
     del cli.logging.SILENCIO
 
     @cli.with_common_args
-    def doit():
+    def doit(config=None):
         pass
 
     run(doit, args=('',), exit=False)
 
     cli.logging.basicConfig.assert_called_with(level='errz')
 
-    doit(use_cache=True)
-    cli.requests_cache.install_cache.assert_called_once()
-
-    cli.requests_cache = None
-    doit(use_cache=True)
-
     run(doit, args=('', '--log-level=debug'), exit=False)
 
     cli.logging.basicConfig.assert_called_with(level='blabla')
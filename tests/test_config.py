@@ -11,7 +11,35 @@ def test_write_config_stdout(mocker):
     assert mock_stdout.getvalue() == b"\n".join([
         b"[pingdom]",
         b"apikey = None",
+        b"cache_dir = None",
+        b"cache_size = 268435456",
+        b"check_ttl = 3600",
+        b"checks = None",
+        b"concurrency = 1",
         b"include_ok = False",
+        b"offline = False",
+        b"outage_mode = results",
+        b"page_ttl = 300",
         b"password = None",
+        b"pool_size = 10",
+        b"prefetch = 0",
+        b"quorum = 0",
+        b"quorum_window = 300",
+        b"rate_limit_file = None",
+        b"store_path = None",
+        b"store_type = json",
+        b"sync_budget = 100",
+        b"sync_history = 30",
+        b"sync_interval = 300",
+        b"username = None",
+        b"[pingdom_async]",
+        b"apikey = None",
+        b"checks = None",
+        b"concurrency = 10",
+        b"include_ok = False",
+        b"limit_per_host = 10",
+        b"password = None",
+        b"rate_limit_file = None",
+        b"url = https://api.pingdom.com/api/2.0/",
         b"username = None",
         b""])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from tests.util import fake_check, mock_checks
+from uptime_report.backends import pingdom
+from uptime_report.daemon import SyncDaemon
+
+NOW = 1500000000
+
+
+def daemon(mocker, tmpdir, checks, **kwargs):
+    """A daemon syncing fake checks with a fake clock starting at NOW."""
+    clock = [NOW]
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 side_effect=lambda: clock[0])
+    b = pingdom.PingdomBackend('user', 'pass', 'key', store_type='sqlite',
+                               store_path=str(tmpdir.join('results.db')))
+    for n, check in enumerate(checks):
+        check.id = n
+        results = check.results.side_effect
+
+        def counted(results=results, **params):
+            b._connection.requests += 1
+            return results(**params)
+        check.results.side_effect = counted
+    mock_checks(mocker, checks)
+
+    def sleep(seconds):
+        clock[0] += seconds
+    return b, SyncDaemon(b, clock=lambda: clock[0], sleep=sleep, **kwargs)
+
+
+def test_run_once(mocker, tmpdir):
+    """Test .run_once polls due checks and backfills their history."""
+    checks = [fake_check(mocker, ['up'] * 200, NOW) for _ in range(2)]
+    b, d = daemon(mocker, tmpdir, checks, history=7200)
+    assert d.run_once() == 150
+    # the first check was polled, both were backfilled
+    assert b.coverage(checks[0]).ranges == [[NOW - 7200, NOW - 600]]
+    assert b.coverage(checks[1]).ranges == [[NOW - 7200, NOW - 900]]
+
+    d.sleep(150)
+    assert d.run_once() == 150
+    assert b.coverage(checks[1]).ranges == [[NOW - 7200, NOW - 450]]
+
+
+def test_poll_tail(mocker, tmpdir):
+    """Test checks are polled from where their coverage ends."""
+    check = fake_check(mocker, ['up'] * 200, NOW)
+    b, d = daemon(mocker, tmpdir, [check], history=3600, budget=0)
+    store_checks = mocker.patch.object(b, 'store_checks',
+                                       wraps=b.store_checks)
+    d.run(cycles=3)
+    assert [c[1] for c in store_checks.call_args_list] == [
+        {'cache': None}] * 3
+    assert b.coverage(check).ranges == [[NOW - 900, NOW]]
+    assert [c[1]['time_from'] for c in check.results.call_args_list] == [
+        NOW - 900, NOW - 600, NOW - 300]
+
+
+def test_backfill_budget(mocker, tmpdir):
+    """Test backfilling stops once the hourly budget is spent."""
+    checks = [fake_check(mocker, ['up'] * 200, NOW) for _ in range(2)]
+    b, d = daemon(mocker, tmpdir, checks, history=7200, budget=3)
+    mocker.patch('uptime_report.backends.pingdom.MAX_OFFSET', 60)
+    d.checks(NOW)
+    assert d.backfill(NOW + 300) == 3
+    # round robin, newest gaps first
+    assert b.coverage(checks[0]).ranges == [[NOW - 7200, NOW - 900]]
+    assert b.coverage(checks[1]).ranges == [[NOW - 4500, NOW - 900]]
+    assert d.backfill(NOW + 300) == 0
+    assert d.backfill(NOW + 3600) == 0
+    d.sleep(3600)
+    assert d.backfill(NOW + 7200) == 2
+    assert b.coverage(checks[1]).ranges == [[NOW - 4500, NOW + 2700]]
+
+
+def test_poll_errors(mocker, tmpdir):
+    """Test a failing poll is logged and retried on the next cycle."""
+    check = fake_check(mocker, ['up'] * 200, NOW)
+    b, d = daemon(mocker, tmpdir, [check], history=3600, budget=0)
+    results = check.results.side_effect
+
+    def failing(**params):
+        if check.results.call_count == 1:
+            raise ValueError('boom')
+        return results(**params)
+    check.results.side_effect = failing
+    d.run(cycles=1)
+    assert b.coverage(check).ranges == []
+    d.run(cycles=1)
+    assert b.coverage(check).ranges == [[NOW - 600, NOW - 300]]
@@ -8,7 +8,7 @@ from uptime_report.outage import Outage
 
 
 def test_encode_outage():
-    s = arrow.utcnow()
+    s = arrow.utcnow().replace(microsecond=0)  # outages keep whole seconds
     f = s.replace(hours=-1)
     o = Outage(start=s, finish=f)
     assert json.loads(json.dumps(o, indent=4, default=encoder)) == {
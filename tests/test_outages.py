@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import arrow
 import pytest
-from uptime_report.outage import (Outage, get_downtime_in_seconds, get_outages,
+from uptime_report import outage
+from uptime_report.outage import (Outage, filter_outage_len,
+                                  get_downtime_in_seconds, get_outages,
                                   merge_outages)
 
 
@@ -87,3 +90,84 @@ def test_get_outages_empty(mocker):
     ret = list(get_outages(backend, overlap=300, minlen=5, foo='bar'))
     backend.get_outages.assert_called_with(foo='bar')
     assert ret == []
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_union_ranges(mocker, seed):
+    """Test the numpy and pure Python range unions agree."""
+    numpy = pytest.importorskip('numpy')
+    rng = numpy.random.RandomState(seed)
+    count = rng.randint(1, 500)
+    starts = rng.randint(0, 10 ** 5, count)
+    finishes = starts + rng.randint(0, 500, count)
+    starts[rng.rand(count) < 0.01] = outage.OPEN_START
+    finishes[rng.rand(count) < 0.01] = outage.OPEN_FINISH
+    merged = outage.union_ranges(starts, finishes)
+    mocker.patch.object(outage, 'numpy', None)
+    assert merged == outage.union_ranges(starts.tolist(), finishes.tolist())
+    assert sorted(n for _, _, members in merged for n in members) == list(
+        range(count))
+
+
+def test_merge_outages_groups():
+    outages = [Outage(start=10, finish=20, meta={'groups': ['a']}),
+               Outage(start=30, finish=40, meta={'groups': ['b']}),
+               Outage(start=20, finish=25, meta={'groups': ['c']})]
+    merged = [(o.start.timestamp, o.finish.timestamp, o.meta)
+              for o in merge_outages(outages, overlap=5)]
+    assert merged == [(10, 40, {'groups': {'a', 'b', 'c'}})]
+    merged = [(o.start.timestamp, o.finish.timestamp, o.meta)
+              for o in merge_outages(outages)]
+    assert merged == [(10, 25, {'groups': {'a', 'c'}}),
+                      (30, 40, {'groups': {'b'}})]
+
+
+@pytest.mark.parametrize('overlap', [0, 4000])
+def test_merge_sorted_outages(outage_data, overlap):
+    """Test merging sorted streams matches merging all outages at once."""
+    outages = [Outage(start=o[1], finish=o[2], meta={'groups': [o[0]]})
+               for o in outage_data]
+    outages[3].start = None
+    outages[-3].finish = None
+    streams = {}
+    for group, o in sorted(
+            zip([o[0] for o in outage_data], outages),
+            key=lambda g: outage.start_timestamp(g[1])):
+        streams.setdefault(group, []).append(o)
+    expected = list(merge_outages(outages, overlap=overlap))
+    merged = merge_outages(
+        outage.OutageStreams(iter(s) for s in streams.values()),
+        overlap=overlap)
+    assert list(merged) == expected
+
+
+def test_merge_sorted_outages_equal_starts():
+    """Test outages of different streams with equal starts are merged."""
+    streams = [[Outage(1, 3, before=0, meta={'groups': ['a']})],
+               [Outage(1, 3, meta={'groups': ['b']})]]
+    merged = list(outage.merge_sorted_outages(streams))
+    assert [(o.start_epoch, o.finish_epoch) for o in merged] == [(1, 3)]
+    assert outage.outage_groups(merged) == {'a', 'b'}
+
+
+def test_outage_epochs():
+    """Test outages keep integer timestamps and view them as Arrow."""
+    o = Outage(start=arrow.get(100), finish='1970-01-01T00:03:20+00:00',
+               after=300.7)
+    assert (o.start_epoch, o.finish_epoch, o.before_epoch, o.after_epoch) == (
+        100, 200, None, 300)
+    assert o.start == arrow.get(100) and o.before is None
+    o.finish = o.after_epoch
+    assert o.finish == arrow.get(300)
+    o.start = None
+    assert o.start is None and o.start_epoch is None
+    assert o == Outage(None, 300, after=300)
+    assert o.for_json() == {'start': None, 'finish': arrow.get(300),
+                            'before': None, 'after': arrow.get(300),
+                            'meta': {}}
+
+
+def test_filter_outage_len():
+    outages = [Outage(0, 2 * 86400), Outage(0, 86400 + 5), Outage(None, 5)]
+    assert list(filter_outage_len(outages, minlen=86400 + 10)) == [
+        outages[0], outages[2]]
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import ssl
+
 import arrow
 import pytest
-from uptime_report.backends import pingdom
+from configobj import ConfigObj
+from tests.util import StandInServer, fake_check, mock_checks
+from uptime_report.backends import backend_config, pingdom
+from uptime_report.outage import Outage, OutageStreams
+from uptime_report.store.archive import STATUSES
 
 
 @pytest.fixture
@@ -36,6 +42,57 @@ def test_pingdom_status():
     assert pingdom.PingdomStatus.UP.to_result() == pingdom.ResultType.UP
 
 
+def test_result():
+    """Test results are compact and keep the time, type and meta views."""
+    items = [{'time': 1500000000, 'probeid': 3, 'status': 'unconfirmed_down',
+              'statusdesc': ''.join(['Time', 'out'])},
+             {'time': 1500000060, 'probeid': 4, 'status': 'unconfirmed_down',
+              'statusdesc': ''.join(['Time', 'out'])}]
+    a, b = [pingdom.make_result('check', item) for item in items]
+    assert not hasattr(a, '__dict__')
+    assert (a.timestamp, a.code, a.probeid, a.desc) == (
+        1500000000, 2, 3, 'Timeout')
+    assert a.desc is b.desc
+    assert a.time == arrow.get(1500000000)
+    assert a.type == pingdom.ResultType.UNCONFIRMED
+    assert a.meta == {'probeid': 3, 'desc': 'Timeout'}
+    assert pingdom.row_result('check', pingdom.result_row(a)) == a
+    with pytest.raises(ValueError):
+        pingdom.Result(time=0, check='check', type='up')
+
+
+def test_make_results():
+    """Test pages of integer times and known statuses are decoded fast."""
+    items = [{'time': 1500000000 + n, 'probeid': n, 'status': status,
+              'statusdesc': 'OK'}
+             for n, status in enumerate(['up', 'down', 'unconfirmed_down',
+                                         'unknown'])]
+    expected = [pingdom.make_result('check', item) for item in items]
+    assert pingdom.make_results('check', items) == expected
+    assert pingdom.make_results('check', []) == []
+    items[0]['time'] = '2017-07-14T02:40:00+00:00'
+    assert pingdom.make_results('check', items) == expected
+    items[0]['status'] = 'sideways'
+    with pytest.raises(ValueError):
+        pingdom.make_results('check', items)
+
+
+def test_default_config_round_trip(mocker, tmpdir):
+    """Test settings written as None by write_config read back as unset."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    path = str(tmpdir.join('uptime_report.cfg'))
+    cfg = ConfigObj(path)
+    cfg['pingdom'] = dict(backend_config(pingdom.PingdomBackend))
+    cfg.write()
+    b = pingdom.PingdomBackend.from_config(ConfigObj(path)['pingdom'])
+    assert (b.rate_limit_file, b.cache_dir, b.store_path) == (None,) * 3
+    assert b.checks is None
+    assert pingdom.selectors('') is None
+    assert b._store is None and b._page_cache is None
+    assert pingdom.optional(' ') is None
+    assert pingdom.optional('/tmp/store') == '/tmp/store'
+
+
 def test_new_connection(mocker):
     """Test PingdomBackend forwards parameters to PingdomLib."""
     mocker.patch('uptime_report.backends.pingdom.Pingdom')
@@ -43,14 +100,161 @@ def test_new_connection(mocker):
     pingdom.Pingdom.assert_called_once_with('user', 'pass', 'key')
 
 
+def pingdom_api(path, limit, offset, **params):
+    """Respond like the Pingdom API with 5 checks run every minute."""
+    limit, offset = int(limit), int(offset)
+    if path == '/api/2.0/checks':
+        return {'checks': [{'id': n, 'name': str(n), 'resolution': 1}
+                           for n in range(5)][offset:offset + limit]}
+    times = range(int(params['to']), int(params['from']) - 1, -60)
+    return {'results': [
+        {'time': t, 'probeid': 1, 'status': 'up'}
+        for t in times[offset:offset + limit]]}
+
+
+@pytest.fixture(params=['http', 'https'])
+def standin(request):
+    """A stand-in Pingdom API server and a client SSL CA path."""
+    if request.param == 'http':
+        yield StandInServer(pingdom_api), True
+        return
+    trustme = pytest.importorskip('trustme')
+    ca = trustme.CA()
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ca.issue_cert('127.0.0.1').configure_cert(context)
+    with ca.cert_pem.tempfile() as path:
+        yield StandInServer(pingdom_api, ssl_context=context), path
+
+
+def test_connection_pool(standin):
+    """Test requests share a pool of persistent connections."""
+    server, verify = standin
+    b = pingdom.PingdomBackend(
+        'user', 'pass', 'key', concurrency=8, pool_size='3')
+    with server.serving() as url:
+        conn = b._connection = pingdom.PingdomConnection(
+            pingdom.Pingdom('user', 'pass', 'key', server=url),
+            pool_size=b.pool_size)
+        conn._session.verify = verify
+        conn._session.trust_env = False
+        results = list(b.get_results(start=1500000000 - 86400,
+                                     finish=1500000000))
+    assert len(results) == 5 * 1441
+    # 1 page of checks and 2 pages of results for each check
+    assert conn.requests == len(server.requests) == 11
+    assert 0 < server.connections <= 3
+    assert len(conn.timings) == 11
+    assert conn.elapsed == pytest.approx(sum(t.elapsed for t in conn.timings))
+    assert conn.shortlimit.startswith('Remaining: 1000')
+    assert server.headers[0]['App-Key'] == 'key'
+    assert server.requests[1][1] == {
+        'from': '1499913600', 'to': '1500000000',
+        'limit': '1000', 'offset': '0'}
+
+
+def test_parse_limit():
+    assert pingdom.parse_limit(
+        'Remaining: 394 Time until reset: 3589') == (394, 3589)
+    assert pingdom.parse_limit('') is None
+    assert pingdom.parse_limit(None) is None
+
+
+def test_rate_limiter(mocker, tmpdir):
+    """Test requests only wait once a quota reported by Pingdom is used."""
+    mocker.patch('uptime_report.backend_utils.time.time', return_value=1000)
+    limiter = pingdom.RateLimiter()
+    assert limiter.reserve() == 0
+    limiter.update({
+        'Req-Limit-Short': 'Remaining: 394 Time until reset: 3589',
+        'Req-Limit-Long': 'Remaining: 71994 Time until reset: 2591989'})
+    assert [limiter.reserve() for _ in range(300)] == [0] * 300
+    limiter.update({
+        'Req-Limit-Short': 'Remaining: 94 Time until reset: 3589',
+        'Req-Limit-Long': 'Remaining: 71694 Time until reset: 2591989'})
+    assert [limiter.reserve() for _ in range(94)] == [0] * 94
+    assert limiter.reserve() == 3589
+    shared = pingdom.RateLimiter(path=str(tmpdir.join('limit')))
+    shared.update({'Req-Limit-Short': 'Remaining: 10 Time until reset: 5'})
+    assert tmpdir.join('limit.req-limit-short').check()
+
+
+def test_connection_retry(mocker):
+    """Test requests rejected by the rate limit are retried."""
+    sleep = mocker.patch('uptime_report.backends.pingdom.time.sleep')
+    conn = pingdom.PingdomConnection(mocker.Mock(url='/'))
+    rejected = mocker.Mock(status_code=429, headers={'Retry-After': '3'})
+    ok = mocker.Mock(status_code=200, headers={
+        'Req-Limit-Short': 'Remaining: 10 Time until reset: 5'})
+    conn._session = mocker.Mock()
+    conn._session.request.side_effect = [rejected, ok]
+    assert conn.request('GET', 'checks', {'foo': True}) == ok
+    sleep.assert_called_once_with(3)
+    conn._session.request.assert_called_with(
+        'GET', '/checks', params={'foo': 'true'})
+    assert conn.requests == 2
+    assert conn.limiter.buckets['Req-Limit-Short'].remaining == 10
+    conn._session.request.side_effect = [rejected] * 4
+    conn.request('GET', 'checks')
+    rejected.raise_for_status.assert_called_once_with()
+
+
 def test_get_checks(mocker):
     """Test .get_checks()."""
     mocker.patch('uptime_report.backends.pingdom.Pingdom')
     b = pingdom.PingdomBackend('user', 'pass', 'key')
-    pingdom.Pingdom.return_value.getChecks.side_effect = [range(3)]
+    mock_checks(mocker, range(3))
     assert list(b.get_checks()) == list(range(3))
 
 
+def test_select_checks(mocker):
+    """Test selecting checks by ID, name, tag and hostname."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    checks = [
+        mocker.Mock(id=1, hostname='www.example.com', tags=[{'name': 'web'}]),
+        mocker.Mock(id=2, hostname='db.example.com', tags=[]),
+        mocker.Mock(id=3, hostname='example.org', tags=[{'name': 'web'}]),
+    ]
+    for n, check in enumerate(checks, 1):
+        check.name = 'check {}'.format(n)
+    b = pingdom.PingdomBackend('user', 'pass', 'key', checks='tag:web, 2')
+    assert b.checks == ['tag:web', '2']
+
+    def select(*selectors):
+        mock_checks(mocker, checks)
+        return [c.id for c in b.select_checks(list(selectors))]
+    assert select() == [1, 2, 3]
+    assert select(3, 1) == [1, 3]
+    assert select('host:*.example.com') == [1, 2]
+    assert select('check [23]') == [2, 3]
+    assert select('tag:db') == []
+
+
+def test_check_index(mocker, tmpdir):
+    """Test the check listing is kept in an index until it is stale."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    get_checks = mock_checks(mocker, [
+        pingdom.PingdomCheck(None, {
+            'id': 1, 'name': 'web', 'resolution': 5, 'type': 'http',
+            'tags': [{'name': 'prod', 'type': 'u', 'count': 1}]})])
+    time = mocker.patch('uptime_report.backends.pingdom.time.time')
+    time.return_value = 1000
+
+    def select(selector):
+        b = pingdom.PingdomBackend('user', 'pass', 'key', checks=selector,
+                                   cache_dir=str(tmpdir), check_ttl='60')
+        return [(c.id, c.name, c.resolution) for c in b.select_checks()]
+    assert select('tag:prod') == [(1, 'web', 5)]
+    assert get_checks.call_count == 1
+    assert tmpdir.join('pingdom-checks.json').check()
+    time.return_value = 1060
+    assert select('1') == [(1, 'web', 5)]
+    assert select('tag:prod') == [(1, 'web', 5)]
+    assert get_checks.call_count == 1
+    time.return_value = 1061
+    mock_checks(mocker, [])
+    assert select('1') == []
+
+
 def test_get_no_results(mocker):
     """Test .get_results with no results."""
     finish = arrow.utcnow()
@@ -59,7 +263,7 @@ def test_get_no_results(mocker):
     b = pingdom.PingdomBackend('user', 'pass', 'key')
     check = mocker.Mock()
     check.results.side_effect = [{'results': []}]
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
+    mock_checks(mocker, [check])
     it = b.get_results(start=start.timestamp, finish=finish.timestamp)
     results = list(it)
     check.results.assert_called_once_with(
@@ -77,7 +281,7 @@ def test_get_result_status(mocker):
     b = pingdom.PingdomBackend('user', 'pass', 'key')
     check = mocker.Mock()
     check.results.side_effect = [{'results': []}]
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
+    mock_checks(mocker, [check])
     it = b.get_results(
         start=start.timestamp, finish=finish.timestamp,
         status=[pingdom.ResultType.DOWN, pingdom.ResultType.UP])
@@ -103,7 +307,7 @@ def test_get_results(mocker):
         'status': 'down'
     }
     check.results.side_effect = [{'results': [data]}]
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
+    mock_checks(mocker, [check])
     it = b.get_results(start=start.timestamp, finish=finish.timestamp)
     results = list(it)
     check.results.assert_called_once_with(
@@ -117,6 +321,31 @@ def test_get_results(mocker):
     assert results[0].type == pingdom.ResultType.DOWN
 
 
+def test_get_results_concurrent(mocker):
+    """Test .get_results fetching checks in parallel."""
+    finish = arrow.utcnow()
+    start = finish.replace(days=-30)
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    b = pingdom.PingdomBackend('user', 'pass', 'key', concurrency='3')
+    assert b.concurrency == 3
+    checks = []
+    for n in range(5):
+        check = mocker.Mock(id=n)
+        check.results.side_effect = [{'results': [{
+            'time': start.timestamp + n,
+            'probeid': n,
+            'status': 'up'
+        }] * 2}]
+        checks.append(check)
+    mock_checks(mocker, checks)
+    it = b.get_results(
+        start=start.timestamp, finish=finish.timestamp, checks=[1, 3, 4])
+    results = list(it)
+    assert [r.check.id for r in results] == [1, 1, 3, 3, 4, 4]
+    assert [r.meta['probeid'] for r in results] == [1, 1, 3, 3, 4, 4]
+    assert not checks[0].results.called
+
+
 def test_get_max_results(mocker):
     """Test .get_results with more than the maximum number."""
     finish = arrow.utcnow()
@@ -130,9 +359,54 @@ def test_get_max_results(mocker):
         'status': 'down'
     }
     check.results.side_effect = [{'results': [data] * 1000}] * 45
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
-    with pytest.raises(Exception, message='Maximum value for offset reached.'):
-        list(b.get_results(start=start.timestamp, finish=finish.timestamp))
+    mock_checks(mocker, [check])
+    with pytest.raises(pingdom.MaxOffsetReached):
+        list(b.get_results())
+
+
+def results_between(time_from, time_to, limit, offset, resolution=60):
+    """Mimic the Pingdom results API for a check run every minute."""
+    times = range(time_to - time_to % resolution, time_from - 1, -resolution)
+    return {'results': [
+        {'time': t, 'probeid': 1, 'status': 'up'}
+        for t in times[offset:offset + limit]]}
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_get_results_windows(mocker, concurrency):
+    """Test .get_results splits long timeframes into windows."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.MAX_OFFSET', 50)
+    b = pingdom.PingdomBackend(
+        'user', 'pass', 'key', concurrency=concurrency)
+    check = mocker.Mock(resolution=1)
+    check.results.side_effect = results_between
+    mock_checks(mocker, [check])
+    start = 1500000000
+    finish = start + 10500
+    results = [r.time.timestamp
+               for r in b.get_results(start=start, finish=finish, limit=10)]
+    assert results == list(range(finish, start - 1, -60))
+    windows = sorted(set(
+        (c[1]['time_from'], c[1]['time_to'])
+        for c in check.results.call_args_list), reverse=True)
+    assert [w[1] - w[0] for w in windows] == [
+        pingdom.window_size(check)] * 3 + [1500]
+
+
+def test_get_results_split_window(mocker):
+    """Test .get_results splits windows with more results than expected."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.MAX_OFFSET', 50)
+    b = pingdom.PingdomBackend('user', 'pass', 'key')
+    check = mocker.Mock(resolution=5)
+    check.results.side_effect = results_between
+    mock_checks(mocker, [check])
+    start = 1500000000
+    finish = start + 10000
+    results = [r.time.timestamp
+               for r in b.get_results(start=start, finish=finish, limit=10)]
+    assert results == list(range(finish - finish % 60, start - 1, -60))
 
 
 def test_get_outages(mocker):
@@ -158,7 +432,7 @@ def test_get_outages(mocker):
         'status': 'up'
     }]
     check.results.side_effect = [{'results': data}]
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
+    mock_checks(mocker, [check])
     it = b.get_outages(start=start.timestamp, finish=finish.timestamp)
     outages = list(it)
     check.results.assert_called_once_with(
@@ -193,7 +467,7 @@ def test_get_outages_include_ok(mocker):
         'status': 'up'
     }]
     check.results.side_effect = [{'results': data}]
-    pingdom.Pingdom.return_value.getChecks.side_effect = [[check]]
+    mock_checks(mocker, [check])
     it = b.get_outages(start=start.timestamp, finish=finish.timestamp)
     outages = list(it)
     check.results.assert_called_once_with(
@@ -205,6 +479,417 @@ def test_get_outages_include_ok(mocker):
     assert outages[0].finish.timestamp == start.replace(minutes=+3).timestamp
 
 
+def test_get_outage_streams(mocker):
+    """Test outages are found and sorted for each check separately."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    b = pingdom.PingdomBackend('user', 'pass', 'key')
+    finish = 1500000000
+    checks = [fake_check(mocker, ['down', 'up', 'down', 'down'], finish),
+              fake_check(mocker, ['down', 'up', 'down', 'up'], finish)]
+    mock_checks(mocker, checks)
+    outages = b.get_outages(start=finish - 600, finish=finish)
+    assert isinstance(outages, OutageStreams)
+    assert [[(o.start and o.start.timestamp, o.finish.timestamp,
+              o.before and o.before.timestamp,
+              o.after and o.after.timestamp) for o in stream]
+            for stream in outages.streams] == [
+        [(finish - 180, finish - 120, None, finish - 60),
+         (finish, finish, finish - 60, None)],
+        [(finish - 120, finish - 120, finish - 180, finish - 60),
+         (finish, finish, finish - 60, None)]]
+
+
+@pytest.mark.parametrize('concurrency,store_type', [
+    (1, 'json'), (4, 'json'), (1, 'sqlite'), (4, 'sqlite')])
+def test_get_stored_results(mocker, tmpdir, concurrency, store_type):
+    """Test .get_results only fetches what the store does not cover."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    time = mocker.patch('uptime_report.backends.pingdom.time.time')
+    finish = 1500000000
+    statuses = (['up'] * 30 + ['down'] * 5) * 10
+    check = fake_check(mocker, statuses, finish)
+    check.id = 7
+    mock_checks(mocker, [check])
+    b = pingdom.PingdomBackend('user', 'pass', 'key', concurrency=concurrency,
+                               store_path=str(tmpdir.join('store')),
+                               store_type=store_type)
+    plain = pingdom.PingdomBackend('user', 'pass', 'key')
+
+    def results(backend, start, finish, **kwargs):
+        mock_checks(mocker, [check])
+        return [(r.time.timestamp, r.type, r.meta['probeid'])
+                for r in backend.get_results(
+                    start=start, finish=finish, limit=100, **kwargs)]
+
+    # results of the last SETTLE_TIME seconds are not covered
+    time.return_value = finish - 3000 + pingdom.SETTLE_TIME
+    assert results(b, finish - 6000, finish - 2000) == results(
+        plain, finish - 6000, finish - 2000)
+    assert b._store.coverage(7).ranges == [[finish - 6000, finish - 3000]]
+
+    time.return_value = finish + pingdom.SETTLE_TIME
+    start = finish - 60 * (len(statuses) - 1)
+    expected = results(plain, start, finish)
+    check.results.reset_mock()
+    assert results(b, start, finish) == expected
+    assert b._store.coverage(7).ranges == [[start, finish]]
+    fetched = set((c[1]['time_from'], c[1]['time_to'])
+                  for c in check.results.call_args_list)
+    assert fetched == {(start, finish - 6000), (finish - 3000, finish)}
+
+    down = [pingdom.ResultType.DOWN]
+    expected = results(plain, start, finish, status=down)
+    check.results.reset_mock()
+    assert results(b, start, finish, status=down) == expected
+    assert not check.results.called
+
+
+@pytest.mark.parametrize('statuses', [
+    ['up'] * 50,
+    ['down'] * 50,
+    (['up'] * 3 + ['down'] * 4 + ['unconfirmed_down'] + ['up'] * 2) * 5,
+    ['down', 'up', 'unconfirmed_down', 'down', 'unknown', 'down'] * 3,
+])
+def test_outages_from_columns(mocker, statuses):
+    """Test outages in archived columns match those in results."""
+    finish = 1500000000
+    check = fake_check(mocker, statuses, finish)
+    results = pingdom.check_window(check, 0, finish)
+    times = [r.time.timestamp for r in reversed(results)]
+    codes = [STATUSES.index(r.type.value) for r in reversed(results)]
+    expected = list(pingdom.outages_from_results(results))
+    assert list(pingdom.scan_columns(times, codes)) == expected
+    assert list(pingdom.outages_from_columns(times, codes)) == expected
+
+
+def test_outages_from_quorum():
+    """Test outages need a quorum of probes reporting DOWN."""
+    up, down = pingdom.UP_CODE, pingdom.DOWN_CODE
+    rows = [(0, up, 1), (60, down, 1), (120, up, 1),      # single probe
+            (180, down, 1), (200, down, 2), (240, down, 3),
+            (300, down, 1), (360, up, 2), (420, up, 1), (480, up, 3),
+            (600, down, 2), (660, down, 3), (1500, up, 1)]
+    assert list(pingdom.outages_from_quorum(rows, 2)) == [
+        Outage(start=180, finish=300, before=120, after=420),
+        Outage(start=600, finish=660, before=480, after=1500)]
+    assert list(pingdom.outages_from_quorum(rows, 3)) == [
+        Outage(start=180, finish=300, before=120, after=360)]
+    assert list(pingdom.outages_from_quorum(rows, 2, window=30)) == [
+        Outage(start=180, finish=200, before=120)]
+    assert list(pingdom.outages_from_quorum(rows[:-1], 2))[-1] == Outage(
+        start=600, finish=660, before=480)
+    assert list(pingdom.outages_from_quorum(rows, 1))[0] == Outage(
+        start=60, finish=60, before=0, after=120)
+    rows = [(0, up, 1), (180, down, 1), (190, up, 2), (200, down, 2),
+            (260, up, 1)]
+    assert list(pingdom.outages_from_quorum(rows, 2)) == [
+        Outage(start=180, finish=200, before=0, after=260)]
+
+
+def test_get_quorum_outages(mocker):
+    """Test .get_outages ignores DOWN results of a single probe."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    finish = 1500000000
+    statuses = ['up'] * 5 + (['down'] * 3 + ['up'] * 5) * 3
+    check = fake_check(mocker, statuses, finish)
+    for n, item in enumerate(check.results(0, finish)['results']):
+        item['probeid'] = 1 if n < 8 else n % 2  # newest outage: one probe
+    mock_checks(mocker, [check])
+    b = pingdom.PingdomBackend('user', 'pass', 'key', quorum=2)
+    outages = list(b.get_outages(start=finish - 3600, finish=finish))
+    assert [(o.start_epoch, o.finish_epoch) for o in outages] == [
+        (finish - 1380, finish - 1260), (finish - 900, finish - 780)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_outages_from_arrays(seed):
+    """Test vectorized outage detection matches the row by row scan."""
+    numpy = pytest.importorskip('numpy')
+    rng = numpy.random.RandomState(seed)
+    count = rng.randint(0, 2000)
+    times = numpy.cumsum(rng.randint(1, 120, count)) + 1500000000
+    # runs of statuses, so that outages are longer than one result
+    codes = numpy.repeat(rng.randint(0, 4, count), rng.randint(1, 5, count))
+    codes = codes[:count]
+    assert (pingdom.outages_from_arrays(times, codes) ==
+            list(pingdom.scan_columns(times.tolist(), codes.tolist())))
+
+
+@pytest.mark.parametrize('store_type', ['archive', 'json', 'sqlite'])
+def test_get_archived_outages(mocker, tmpdir, store_type):
+    """Test .get_outages finds outages in the columns of stored results."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2000000000)
+    finish = 1500000000
+    check = fake_check(mocker, ['up', 'down', 'down', 'up'] * 100, finish)
+    check.id = 3
+    b = pingdom.PingdomBackend('user', 'pass', 'key', store_type=store_type,
+                               store_path=str(tmpdir.join('store')))
+    plain = pingdom.PingdomBackend('user', 'pass', 'key')
+    start = finish - 60 * 399
+    mock_checks(mocker, [check])
+    expected = list(plain.get_outages(start=start, finish=finish))
+    assert len(expected) == 100
+    for _ in range(2):
+        check.results.reset_mock()
+        mock_checks(mocker, [check])
+        assert list(b.get_outages(start=start, finish=finish)) == expected
+    assert not check.results.called
+
+
+def test_result_batch(mocker):
+    """Test batches hold the same results and outages as single results."""
+    finish = 1500000000
+    statuses = (['up'] * 3 + ['down'] * 4 + ['unconfirmed_down']) * 5
+    check = fake_check(mocker, statuses, finish)
+    results = pingdom.check_window(check, 0, finish)
+    batch = pingdom.check_batch(check, 0, finish)
+    assert len(batch) == len(results) == 40
+    assert batch.time.tolist() == [r.timestamp for r in results]
+    assert list(batch.results()) == results
+    assert list(batch.outages()) == list(
+        pingdom.outages_from_results(results))
+    assert batch.counts() == {pingdom.ResultType.UP: 15,
+                              pingdom.ResultType.DOWN: 20,
+                              pingdom.ResultType.UNCONFIRMED: 5}
+    rows = [pingdom.result_row(r) for r in results]
+    stored = pingdom.ResultBatch.from_rows(check, rows)
+    assert stored.time == batch.time
+    assert stored.response.tolist() == [0] * 40
+    with pytest.raises(ValueError):
+        pingdom.ResultBatch.from_items(check, [{'time': 0, 'status': 'meh'}])
+
+
+@pytest.mark.parametrize('store_type', [None, 'json'])
+def test_get_result_batches(mocker, tmpdir, store_type):
+    """Test .get_result_batches yields the results of .get_results."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2000000000)
+    mocker.patch('uptime_report.backends.pingdom.MAX_OFFSET', 60)
+    finish = 1500000000
+    checks = []
+    for n in range(2):
+        check = fake_check(mocker, ['up', 'down', 'up'] * 100, finish)
+        check.id = n
+        checks.append(check)
+    store = store_type and str(tmpdir.join('store'))
+    b = pingdom.PingdomBackend('user', 'pass', 'key', store_path=store,
+                               store_type=store_type or 'json')
+    start = finish - 60 * 299
+    mock_checks(mocker, checks)
+    expected = list(b.get_results(start=start, finish=finish))
+    mock_checks(mocker, checks)
+    batches = list(b.get_result_batches(start=start, finish=finish))
+    assert len(batches) == (2 if store else 10)
+    assert [r for batch in batches for r in batch.results()] == [
+        pingdom.Result(time=r.timestamp, check=r.check, type=r.type,
+                       meta={'probeid': r.probeid}) for r in expected]
+
+
+def test_get_results_page_cache(mocker, tmpdir):
+    """Test pages are cached and expire if their window was open."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    time = mocker.patch('uptime_report.backends.pingdom.time.time')
+    mocker.patch('uptime_report.cache.time.time', time)
+    finish = 1500000000
+    time.return_value = finish + pingdom.SETTLE_TIME - 100
+    check = fake_check(mocker, ['up', 'down'] * 100, finish)
+    check.id = 5
+    b = pingdom.PingdomBackend('user', 'pass', 'key', cache_dir=str(tmpdir),
+                               page_ttl=60)
+    b._check_index = None
+
+    def results(**kwargs):
+        mock_checks(mocker, [check])
+        return [r.time.timestamp for r in b.get_results(
+            start=finish - 3600, finish=finish, limit=30, **kwargs)]
+
+    down = [pingdom.ResultType.DOWN]
+    times = list(range(finish, finish - 3601, -60))
+    log_stats = mocker.spy(b._page_cache, 'log_stats')
+    assert results() == results() == times
+    assert results(status=down) == results(status=down) == times[1::2]
+    assert check.results.call_count == 3 + 2
+    assert log_stats.call_count == 4
+    assert tmpdir.join('pingdom-pages').check(dir=True)
+
+    # windows touching now expire after the TTL
+    time.return_value += 61
+    assert results() == times
+    assert check.results.call_count == 5 + 3
+
+    # pages fetched once windows are in the past never do
+    time.return_value += 10 ** 6
+    for _ in range(2):
+        assert results() == times
+        assert results(status=down) == times[1::2]
+    assert check.results.call_count == 8 + 5
+
+
+def test_sync(mocker, tmpdir):
+    """Test .sync fetches what the store does not cover and resumes."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2000000000)
+    finish = 1500000000
+    check = fake_check(mocker, ['up'] * 200, finish)
+    check.id = 5
+    results = check.results.side_effect
+
+    def interrupted(**kwargs):
+        if check.results.call_count > 1:
+            raise ValueError('interrupted')
+        return results(**kwargs)
+    check.results.side_effect = interrupted
+    b = pingdom.PingdomBackend('user', 'pass', 'key', store_type='sqlite',
+                               store_path=str(tmpdir.join('results.db')))
+    mocker.patch('uptime_report.backends.pingdom.MAX_OFFSET', 60)
+    start = finish - 60 * 120
+    mock_checks(mocker, [check])
+    with pytest.raises(ValueError):
+        b.sync(start, finish, limit=100)
+    assert b._store.coverage(5).ranges == [[finish - 3600, finish]]
+
+    check.results.side_effect = results
+    mock_checks(mocker, [check])
+    stats = b.sync(start, finish, limit=100)
+    assert stats['checks'] == 1
+    assert stats['results'] == 61
+    assert b._store.coverage(5).ranges == [[start, finish]]
+    with pytest.raises(ValueError):
+        pingdom.PingdomBackend('user', 'pass', 'key').sync(start, finish)
+
+
+def test_compact(mocker, tmpdir):
+    """Test .compact drops cached pages the store covers."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2000000000)
+    finish = 1500000000
+    check = fake_check(mocker, ['up', 'down'] * 100, finish)
+    check.id = 5
+    b = pingdom.PingdomBackend('user', 'pass', 'key', cache_dir=str(tmpdir),
+                               store_path=str(tmpdir.join('results.db')),
+                               store_type='sqlite')
+    b._check_index = None
+    for start in (finish - 3600, finish - 7200):
+        mock_checks(mocker, [check])
+        list(b.get_results(start=start, finish=start + 600, limit=30))
+        mock_checks(mocker, [check])
+        list(b._get_results(start, start + 1200, None, None, limit=30))
+    pages = tmpdir.join('pingdom-pages')
+    assert len(list(pages.visit('*.json.z'))) == 2 + 2
+    b.compact()
+    assert len(list(pages.visit('*.json.z'))) == 2
+    assert b._page_cache.evictions == 2
+
+
+def test_offline(mocker, tmpdir):
+    """Test an offline backend reports from the store or lists its gaps."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2000000000)
+    finish = 1500000000
+    check = fake_check(mocker, ['up', 'down', 'down', 'up'] * 50, finish)
+    check.configure_mock(id=5, name='web', hostname='example.com',
+                         created=0, tags=[])
+    settings = dict(cache_dir=str(tmpdir), store_type='sqlite',
+                    store_path=str(tmpdir.join('results.db')))
+    b = pingdom.PingdomBackend('user', 'pass', 'key', **settings)
+    mock_checks(mocker, [check])
+    b.sync(finish - 3600, finish)
+    online = [(o.start, o.finish) for o in b.get_outages(
+        start=finish - 3600, finish=finish)]
+    assert online
+
+    # the check index is stale, the outage mode needs the API
+    mocker.patch('uptime_report.backends.pingdom.time.time',
+                 return_value=2100000000)
+    get_checks = mock_checks(mocker)
+    calls = check.results.call_count
+    offline = pingdom.PingdomBackend('user', 'pass', 'key', offline='True',
+                                     outage_mode='summary', **settings)
+    assert [(o.start, o.finish) for o in offline.get_outages(
+        start=finish - 3600, finish=finish)] == online
+    with pytest.raises(pingdom.MissingResults) as e:
+        list(offline.get_outages(start=finish - 7200, finish=finish + 60))
+    assert [(c.id, s, f) for c, s, f in e.value.gaps] == [
+        (5, finish, finish + 60), (5, finish - 7200, finish - 3600)]
+    assert "missing 2 windows" in str(e.value)
+    assert "check 5 (web): 2017-07-14T02:40:00+00:00" in str(e.value)
+    assert check.results.call_count == calls
+    assert not get_checks.called
+
+    offline._check_index = None
+    with pytest.raises(ValueError):
+        offline.require_coverage(finish - 3600, finish)
+    offline = pingdom.PingdomBackend('user', 'pass', 'key', offline=True)
+    with pytest.raises(ValueError):
+        offline.require_coverage(finish - 3600, finish)
+
+
+@pytest.mark.parametrize('statuses,count', [
+    (['up'] * 5000, 0),
+    (['down'] * 3 + ['unconfirmed_down'] + ['up'] * 5000, 1),
+    (['up'] * 10 + ['down'] * 3 + ['unconfirmed_down'] + ['up'] * 5000 +
+     ['unconfirmed_down'] + ['up'] * 2000 + ['down'] * 20 +
+     ['up'] * 3000 + ['down', 'up', 'down'] + ['up'] * 10, 4),
+    (['up'] * 3000 + ['down'] * 10, 1),
+])
+def test_get_outages_filtered(mocker, statuses, count):
+    """Test .get_outages finds the same outages with filtered results."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    finish = 1500000000
+    start = finish - len(statuses) * 60 + 60
+    outages = {}
+    for mode in [pingdom.OutageMode.RESULTS, pingdom.OutageMode.FILTERED]:
+        b = pingdom.PingdomBackend(
+            'user', 'pass', 'key', outage_mode=mode.value)
+        check = fake_check(mocker, statuses, finish)
+        check.id = 173494
+        mock_checks(mocker, [check])
+        outages[mode] = (
+            list(b.get_outages(start=start, finish=finish)),
+            check.transferred)
+    filtered, transferred = outages[pingdom.OutageMode.FILTERED]
+    expected, total = outages[pingdom.OutageMode.RESULTS]
+    assert filtered == expected
+    assert len(expected) == count
+    assert total == len(statuses)
+    assert transferred < total * 0.05
+
+
+def test_get_outages_summary(mocker):
+    """Test .get_outages from the state changes of a check."""
+    mocker.patch('uptime_report.backends.pingdom.Pingdom')
+    b = pingdom.PingdomBackend(
+        'user', 'pass', 'key', outage_mode='summary', include_ok=True)
+    check = mocker.Mock(id=173494)
+    check.outages.return_value = [
+        {'status': 'down', 'timefrom': 100, 'timeto': 200},
+        {'status': 'up', 'timefrom': 200, 'timeto': 300},
+        {'status': 'down', 'timefrom': 300, 'timeto': 400},
+        {'status': 'unknown', 'timefrom': 400, 'timeto': 500},
+    ]
+    mock_checks(mocker, [check])
+    outages = list(b.get_outages(start=100, finish=500))
+    check.outages.assert_called_once_with(time_from=100, time_to=500)
+    assert not check.results.called
+    assert [(o.start.timestamp, o.finish.timestamp) for o in outages] == [
+        (100, 200), (300, 400)]
+    assert outages[0].before is None
+    assert outages[0].after.timestamp == 200
+    assert outages[1].before.timestamp == 300
+    assert outages[1].after is None
+
+
+def test_outage_mode_invalid():
+    with pytest.raises(ValueError):
+        pingdom.PingdomBackend('user', 'pass', 'key', outage_mode='foo')
+
+
 def test_outages_from_results(mocker, pingdom_results, outage_data):
     """Test outages_from_results."""
     outages = list(pingdom.outages_from_results(
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import asyncio
+import time
+
+import pytest
+from uptime_report.backends.pingdom import ResultType
+from uptime_report.outage import get_outages
+
+web = pytest.importorskip('aiohttp.web')
+test_utils = pytest.importorskip('aiohttp.test_utils')
+pingdom_async = pytest.importorskip('uptime_report.backends.pingdom_async')
+
+LATENCY = 0.05
+
+
+def make_app(results, latency=LATENCY):
+    """Create a stand-in for the Pingdom API serving canned results."""
+    app = web.Application()
+    app['requests'] = []
+
+    async def checks(request):
+        app['requests'].append(request)
+        return web.json_response({'checks': [
+            {'id': check_id, 'name': 'check {}'.format(check_id)}
+            for check_id in sorted(results)]})
+
+    async def check_results(request):
+        app['requests'].append(request)
+        await asyncio.sleep(latency)
+        data = [r for r in results[int(request.match_info['check'])]
+                if int(request.query.get('from', 0)) <= r['time'] <=
+                int(request.query.get('to', r['time']))]
+        limit = int(request.query['limit'])
+        offset = int(request.query['offset'])
+        return web.json_response({'results': data[offset:offset + limit]})
+
+    app.router.add_get('/api/2.0/checks', checks)
+    app.router.add_get('/api/2.0/results/{check}', check_results)
+    return app
+
+
+def make_results(n, status='up', start=1500000000):
+    return [{'time': start - i * 60, 'probeid': i % 3, 'status': status}
+            for i in range(n)]
+
+
+def run(backend, app, method, **kwargs):
+    loop = asyncio.new_event_loop()
+    server = test_utils.TestServer(app)
+    loop.run_until_complete(server.start_server())
+    backend.url = str(server.make_url('/api/2.0/'))
+
+    async def collect():
+        return [item async for item in getattr(backend, method)(**kwargs)]
+
+    try:
+        return loop.run_until_complete(collect())
+    finally:
+        loop.run_until_complete(server.close())
+        loop.close()
+
+
+def test_get_checks():
+    b = pingdom_async.AsyncPingdomBackend('user', 'pass', 'key')
+    app = make_app({1: [], 2: []})
+    checks = run(b, app, 'get_checks')
+    assert [c.id for c in checks] == [1, 2]
+    assert checks[0].name == 'check 1'
+    assert app['requests'][0].headers['App-Key'] == 'key'
+    assert b._session is None
+
+
+def test_get_results_concurrent():
+    b = pingdom_async.AsyncPingdomBackend(
+        'user', 'pass', 'key', concurrency=20)
+    data = {n: make_results(1500) for n in range(20)}
+    app = make_app(data)
+    t = time.time()
+    results = run(b, app, 'get_results',
+                  start=1500000000 - 1499 * 60, finish=1500000000)
+    elapsed = time.time() - t
+    assert len(results) == 20 * 1500
+    assert [r.check.id for r in results[::1500]] == list(range(20))
+    # two pages per check, all checks in parallel
+    assert elapsed < 20 * 2 * LATENCY
+    query = app['requests'][1].query
+    assert query['from'] == '1499910060'
+    assert query['to'] == '1500000000'
+
+
+def test_get_results_max_offset(mocker):
+    mocker.patch.object(pingdom_async, 'MAX_OFFSET', 2)
+    b = pingdom_async.AsyncPingdomBackend('user', 'pass', 'key')
+    data = make_results(10)
+    app = make_app({1: data}, latency=0)
+    results = run(b, app, 'get_results', limit=3, status=[ResultType.UP],
+                  start=data[-1]['time'], finish=data[0]['time'])
+    assert [r.time.timestamp for r in results] == [d['time'] for d in data]
+    with pytest.raises(pingdom_async.MaxOffsetReached):
+        run(b, make_app({1: data}, latency=0), 'get_results', limit=3)
+
+
+def test_get_outages():
+    b = pingdom_async.AsyncPingdomBackend('user', 'pass', 'key')
+    data = make_results(2) + make_results(2, 'down', 1500000000 - 120)
+    data += make_results(1, start=1500000000 - 240)
+    outages = run(b, make_app({1: data}, latency=0), 'get_outages')
+    assert len(outages) == 1
+    assert outages[0].start.timestamp == 1500000000 - 180
+    assert outages[0].finish.timestamp == 1500000000 - 120
+
+
+def test_get_outages_per_check():
+    """Test outages are found per check and never span two checks."""
+    b = pingdom_async.AsyncPingdomBackend('user', 'pass', 'key')
+    data = {1: make_results(1, start=300) + make_results(1, 'down', 240),
+            2: make_results(1, 'down', 1000) + make_results(1, start=900)}
+    outages = run(b, make_app(data, latency=0), 'get_outages')
+    assert [(o.start_epoch, o.finish_epoch) for o in outages] == [
+        (240, 240), (1000, 1000)]
+
+
+def test_get_outages_sync(mocker):
+    """Test the CLI helpers can consume an asynchronous backend."""
+    backend = mocker.Mock()
+
+    async def outages(**kwargs):
+        for outage in []:
+            yield outage
+    backend.get_outages = outages
+    assert list(get_outages(backend)) == []
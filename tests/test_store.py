@@ -0,0 +1,154 @@
+from __future__ import unicode_literals
+
+import mmap
+from array import array
+
+import pytest
+from uptime_report.store import Coverage, open_store
+
+
+def test_coverage_add():
+    c = Coverage()
+    c.add(10, 10)
+    assert c.ranges == []
+    c.add(30, 40)
+    c.add(10, 20)
+    c.add(50, 60)
+    assert c.ranges == [[10, 20], [30, 40], [50, 60]]
+    c.add(15, 55)
+    assert c.ranges == [[10, 60]]
+
+
+def test_coverage_gaps():
+    c = Coverage([[10, 20], [30, 40]])
+    assert c.gaps(0, 5) == [(0, 5)]
+    assert c.gaps(0, 10) == [(0, 10)]
+    assert c.gaps(15, 35) == [(20, 30)]
+    assert c.gaps(20, 30) == [(20, 30)]
+    assert c.gaps(10, 40) == [(20, 30)]
+    assert c.gaps(5, 45) == [(40, 45), (20, 30), (5, 10)]
+    assert Coverage().gaps(1, 2) == [(1, 2)]
+
+
+@pytest.mark.parametrize('kind', ['json', 'sqlite'])
+def test_store(tmpdir, kind):
+    path = str(tmpdir.join('store'))
+    store = open_store(path, kind)
+    assert store.coverage(1).ranges == []
+    assert store.results(1, 0, 100) == []
+    store.add(1, 0, 50, [(10, 'up', 1, 'OK'), (40, 'down', 2, 'Timeout')])
+    store.add(1, 40, 60, [(40, 'down', 3, 'Timeout'), (60, 'up', 1, 'OK')])
+    store.add(2, 5, 5, [(5, 'up', 1, 'OK')])
+    assert store.coverage(1).ranges == [[0, 60]]
+    assert store.coverage(2).ranges == []
+    store.close()
+    store = open_store(path, kind)
+    assert store.results(1, 0, 100) == [
+        (60, 'up', 1, 'OK'), (40, 'down', 3, 'Timeout'), (10, 'up', 1, 'OK')]
+    assert store.results(1, 10, 40, status=['down']) == [
+        (40, 'down', 3, 'Timeout')]
+    assert store.results(2, 0, 10) == [(5, 'up', 1, 'OK')]
+
+
+def test_sqlite_store_batches(tmpdir, mocker):
+    mocker.patch('uptime_report.store.sqlite.BATCH_SIZE', 3)
+    store = open_store(str(tmpdir.join('results.db')), 'sqlite')
+    rows = [(t, 'up', 1, None) for t in range(10)]
+    store.add(1, 0, 9, iter(rows))
+    assert store.results(1, 0, 9) == rows[::-1]
+    assert store.results(1, 3, 4, status=['down']) == []
+    mode = store.db.execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+    plan = ' '.join(r[-1] for r in store.db.execute(
+        'EXPLAIN QUERY PLAN SELECT time FROM results '
+        'WHERE check_id = 1 AND time BETWEEN 3 AND 4'))
+    assert 'USING PRIMARY KEY' in plan or 'autoindex' in plan
+
+
+def test_open_store_unknown(tmpdir):
+    with pytest.raises(ValueError):
+        open_store(str(tmpdir), kind='nope')
+
+
+def test_archive_store(tmpdir, mocker):
+    mocker.patch('uptime_report.store.archive.INDEX_STRIDE', 4)
+    store = open_store(str(tmpdir), 'archive')
+    assert len(store.columns(1, 0, 100)) == 0
+    assert store.results(1, 0, 100) == []
+    store.add(1, 0, 50, [(t, 'up', 2, 'OK') for t in range(0, 50, 5)])
+    store.add(1, 50, 100, [(t, 'down', None, 'Timeout')
+                           for t in range(50, 100, 5)])  # appended
+    store.add(1, 0, 0, [(20, 'unconfirmed', 3, None),
+                        (20, 'unknown', 3, None)])  # merged
+    assert store.coverage(1).ranges == [[0, 100]]
+    assert tmpdir.join('1', 'index').size() == 5 * 8
+
+    store = open_store(str(tmpdir), 'archive')
+    columns = store.columns(1, 12, 57)
+    assert isinstance(columns.time.obj, mmap.mmap)
+    assert list(columns.time) == list(range(15, 56, 5))
+    assert list(columns.status) == [0, 3, 0, 0, 0, 0, 0, 1, 1]
+    assert list(columns.probe) == [2, 3] + [2] * 5 + [0] * 2
+    assert store.results(1, 15, 55, status=['down', 'unknown']) == [
+        (55, 'down', None, None), (50, 'down', None, None),
+        (20, 'unknown', 3, None)]
+    for start in range(-1, 101):
+        for finish in range(start, 102, 7):
+            assert list(store.columns(1, start, finish).time) == [
+                t for t in range(0, 100, 5) if start <= t <= finish]
+
+
+def test_archive_store_merge(tmpdir, mocker):
+    """Test older rows are merged into the archived columns."""
+    mocker.patch('uptime_report.store.archive.INDEX_STRIDE', 4)
+    store = open_store(str(tmpdir), 'archive')
+    store.add(1, 100, 200, [(t, 'up', 1, None) for t in range(100, 200, 10)])
+    store.add(1, 0, 100, [(t, 'down', 2, None) for t in range(0, 100, 10)])
+    store.add(1, 140, 160, [(145, 'unknown', 3, None),
+                            (150, 'down', 3, None)])
+    columns = store.columns(1, 0, 200)
+    assert list(columns.time) == list(range(0, 150, 10)) + [145] + list(
+        range(150, 200, 10))
+    assert list(columns.status) == [1] * 10 + [0] * 5 + [3, 1] + [0] * 4
+    assert list(columns.probe) == [2] * 10 + [1] * 5 + [3, 3] + [1] * 4
+    assert tmpdir.join('1', 'index').size() == 6 * 8
+
+
+def test_archive_store_repair(tmpdir, mocker):
+    """Test columns of an interrupted append are truncated to line up."""
+    mocker.patch('uptime_report.store.archive.INDEX_STRIDE', 4)
+    store = open_store(str(tmpdir), 'archive')
+    store.add(1, 0, 50, [(t, 'up', 2, None) for t in range(0, 50, 5)])
+    with tmpdir.join('1', 'time').open('ab') as fp:
+        fp.write(array('q', [50, 55]).tobytes())  # status and probe missing
+    store = open_store(str(tmpdir), 'archive')
+    assert list(store.columns(1, 0, 100).time) == list(range(0, 50, 5))
+    store.add(1, 50, 60, [(50, 'down', 3, None)])
+    assert store.results(1, 45, 100) == [
+        (50, 'down', 3, None), (45, 'up', 2, None)]
+    assert tmpdir.join('1', 'index').size() == 3 * 8
+
+
+def test_archive_store_interrupted_merge(tmpdir, mocker):
+    """Test a merge interrupted between columns loses no archived rows."""
+    store = open_store(str(tmpdir), 'archive')
+    store.add(1, 100, 200, [(t, 'down', 2, None) for t in range(100, 200, 10)])
+    write = store._write
+
+    def interrupted(check_id, name, data, append=False, generation=0):
+        if name == 'status' and not append:
+            raise KeyboardInterrupt
+        write(check_id, name, data, append, generation)
+    mocker.patch.object(store, '_write', side_effect=interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        store.add(1, 0, 100, [(t, 'up', 1, None) for t in range(0, 100, 10)])
+
+    store = open_store(str(tmpdir), 'archive')
+    assert store.coverage(1).ranges == [[100, 200]]
+    assert store.results(1, 0, 200)[::-1] == [
+        (t, 'down', 2, None) for t in range(100, 200, 10)]
+    store.add(1, 0, 100, [(t, 'up', 1, None) for t in range(0, 100, 10)])
+    assert len(store.columns(1, 0, 200)) == 20
+    assert sorted(f.basename for f in tmpdir.join('1').listdir()) == [
+        'columns.json', 'coverage.json', 'index', 'probe.1', 'status.1',
+        'time.1']
@@ -1,7 +1,13 @@
+import json
 import sys
+import threading
 from contextlib import contextmanager
 
 from six import BytesIO
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import parse_qsl, urlparse
+from uptime_report.backends import pingdom
 
 
 class TeeIO(BytesIO):
@@ -25,3 +31,99 @@ class TeeIO(BytesIO):
     @contextmanager
     def as_manager(self):
         yield self
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve JSON responses computed by the server's ``respond`` method."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append((url.path, dict(parse_qsl(url.query))))
+        self.server.headers.append(dict(self.headers))
+        body = json.dumps(self.server.respond(
+            url.path, **dict(parse_qsl(url.query)))).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header(
+            'Req-Limit-Short', 'Remaining: 1000 Time until reset: 1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """A local stand-in for a JSON API that counts connections.
+
+    :param respond: a callable receiving the request path and query
+        parameters and returning the data to respond with.
+    :param ssl_context: optional server side :class:`ssl.SSLContext`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, respond, ssl_context=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.respond = respond
+        self.connections = 0
+        self.requests = []
+        self.headers = []
+        self.scheme = 'http'
+        if ssl_context is not None:
+            self.socket = ssl_context.wrap_socket(
+                self.socket, server_side=True)
+            self.scheme = 'https'
+
+    def get_request(self):
+        request = HTTPServer.get_request(self)
+        self.connections += 1
+        return request
+
+    @property
+    def url(self):
+        return '{}://127.0.0.1:{}'.format(self.scheme, self.server_port)
+
+    @contextmanager
+    def serving(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            yield self.url
+        finally:
+            self.shutdown()
+            self.server_close()
+
+
+def mock_checks(mocker, *pages):
+    """Mock the pages of checks returned by the Pingdom API."""
+    return mocker.patch.object(
+        pingdom.PingdomConnection, 'getChecks', side_effect=list(pages))
+
+
+def fake_check(mocker, statuses, finish, resolution=60):
+    """A check with a result every ``resolution`` seconds until ``finish``.
+
+    The check implements the filters of the results API and counts the
+    results it returns.
+    """
+    data = [{'time': finish - n * resolution, 'probeid': 1, 'status': st}
+            for n, st in enumerate(statuses)]
+    check = mocker.Mock(resolution=resolution // 60, transferred=0)
+
+    def results(time_from=None, time_to=None, status=None,
+                limit=1000, offset=0):
+        status = status.split(',') if status else None
+        page = [r for r in data
+                if time_from <= r['time'] <= time_to and
+                (not status or r['status'].replace(
+                    'unconfirmed_down', 'unconfirmed') in status)]
+        page = page[offset:offset + limit]
+        check.transferred += len(page)
+        return {'results': page}
+    check.results.side_effect = results
+    return check